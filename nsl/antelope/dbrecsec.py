@@ -7,13 +7,12 @@ dbrecsec.py script
 """
 import os
 
-import numpy
 import obspy.core
-from matplotlib import pyplot as plt
 
 import curds2.dbapi2 as dbapi2
 from curds2.rows import OrderedDictRow
 import nsl.common.logging as logging
+from nsl.antelope.util.dbrecsec import plot_stream_recsec
 
 LOG = logging.customLogger(__name__)
 
@@ -52,46 +51,14 @@ def db2stream(dbname, orid, t_pre=T_PRE, t_post=T_POST):
     return st
 
 
-def stream2fig(st, time_offset=T_PRE, trace_distance=2):
+def stream2fig(st, time_offset=T_PRE, trace_distance=2, decimate=True):
     """
     Return a figure containing record section plot given an obspy Stream
     """
-    bb = 'blue'
-    sp = 'black'
-    x = 'green'
-    color = {'B': bb, 'H': bb, 'E': sp, 'S': sp, 'default':x}
     font_size = 20
     if len(st) > 50:
         font_size = 12
-    fig = plt.figure(figsize=(16.5, 12.75))
-    ax = fig.add_subplot(111)
-    ytics = []
-    yticlabels = []
-    for n, tr in enumerate(st):
-        sta = tr.stats.station
-        chan = tr.stats.channel
-        t = numpy.arange(tr.data.size) / tr.stats.sampling_rate - time_offset
-        tr.data = tr.data.astype(numpy.float64)
-        tr.data -= tr.data.mean()
-        tr.data /= numpy.amax(numpy.abs(tr.data))
-        if chan[0] in ('B', 'H', 'D'):
-            tr.filter('highpass', freq=1.0)
-            try:
-                tr.taper(max_percentage=0.05, type='cosine')
-            except:
-                tr.taper()  # depricated, but needed for now
-        ypos = trace_distance * n
-        tr.data += ypos
-        ytics.append(ypos)
-        yticlabels.append(' '.join([sta, chan]))
-        ax.plot(t, tr.data, linewidth=0.5, color=color.get(chan[0], color['default']))
-    ax.set_xlim(t[0],t[-1])
-    ax.set_xlabel("Time from P-arrival (s)")
-    ax.set_ylim(0-trace_distance, ypos+trace_distance)
-    ax.set_yticks(ytics)
-    ax.set_yticklabels(yticlabels, fontsize=font_size, fontweight='bold')
-    ax.grid(True, axis='x')
-    return fig
+    return plot_stream_recsec(st, time_offset, trace_distance, font_size, decimate)
 
 
 def dbrecsec(dbname, orid, filename=None):
@@ -4,28 +4,150 @@ nsl.antelope.pf
 
 Provide a common unified interface for Antelope pf files
 
+Converted pfs are kept per process by name, with the mtime and size of
+each file found for the name on PFPATH, so a repeat call is a few
+os.stat calls and the pf is only read again when one of its files
+changes. With a sidecar directory (PF_SIDECAR_DIR, or the NSL_PF_CACHE
+environment variable), the converted pf is also saved as JSON, so new
+processes can skip pfread too.
+
 Functions
 ---------
 get_pf(pfname) : Return a dict containing pf file contents
+pf_paths(pfname) : Return list of files making up a pf, in PFPATH order
+pf_stamps(pfname) : Return tuple of (path, mtime, size) of the pf files
 
 """
+import copy
+import json
+import os
+import tempfile
+
 try:
     from antelope import stock
 except ImportError:
     try:
-        import os
         import sys
         sys.path.append(os.path.join(os.environ['ANTELOPE'], 'data', 'python'))
         from antelope import stock
     except:
         stock = object()
 
+PF_SIDECAR_DIR = os.environ.get('NSL_PF_CACHE')
+
+_paths = {}  # {(pfname, PFPATH): list of files}
+_pfs = {}    # {pfname: (stamps, dict)}
+
+
+def _pfpath():
+    """Return list of PFPATH directories (Antelope default if not set)"""
+    default = os.path.join(os.environ.get('ANTELOPE', ''), 'data', 'pf') + ':.'
+    return os.environ.get('PFPATH', default).split(':')
+
+
+def pf_paths(pfname):
+    """
+    Return list of files making up a pf, in PFPATH order (later files
+    override earlier ones). A name with a directory is used as is.
+
+    The PFPATH search is done once per name and PFPATH.
+    """
+    name = pfname if pfname.endswith('.pf') else pfname + '.pf'
+    if os.path.dirname(name):
+        return [os.path.abspath(name)] if os.path.isfile(name) else []
+    key = (pfname, os.environ.get('PFPATH'))
+    try:
+        return _paths[key]
+    except KeyError:
+        paths = [os.path.abspath(os.path.join(d, name)) for d in _pfpath()
+                 if d and os.path.isfile(os.path.join(d, name))]
+        _paths[key] = paths = [p for n, p in enumerate(paths) if p not in paths[:n]]
+        return paths
+
+
+def pf_stamps(pfname):
+    """
+    Return tuple of (path, mtime, size) of the files of a pf, or None if
+    no files are found
+    """
+    stamps = []
+    for path in pf_paths(pfname):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue  # removed since the search
+        stamps.append((path, st.st_mtime, st.st_size))
+    return tuple(stamps) or None
+
+
+def _sidecar(pfname, sidecar_dir):
+    """Return str of JSON sidecar filename of a pf"""
+    name = os.path.abspath(pfname) if os.path.dirname(pfname) else pfname
+    return os.path.join(sidecar_dir, name.strip(os.sep).replace(os.sep, '%') + '.json')
 
-def get_pf(pfname):
-    """Return a dict from a pf file"""
+
+def _read_sidecar(filename, stamps):
+    """Return pf dict from a sidecar if its stamps match, else None"""
+    try:
+        with open(filename) as f:
+            saved = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+    if [list(s) for s in stamps] != saved.get('stamps'):
+        return None
+    return saved.get('pf')
+
+
+def _write_sidecar(filename, stamps, pf):
+    """Save pf dict and its stamps to a sidecar, replacing it in one step"""
+    directory = os.path.dirname(filename)
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        fd, tmpname = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'stamps': [list(s) for s in stamps], 'pf': pf}, f)
+        os.rename(tmpname, filename)
+    except (IOError, OSError, TypeError, ValueError):
+        pass  # only a speedup
+
+
+def _read_pf(pfname):
+    """Return a dict from a pf file using Antelope"""
     if hasattr(stock, 'pfread'):
         return stock.pfread(pfname).pf2dict()
     elif hasattr(stock, 'pfget'):
         return stock.pfget(pfname)
     else:
         raise AttributeError("No pf function available")
+
+
+def get_pf(pfname, sidecar_dir=None):
+    """
+    Return a dict from a pf file
+
+    The result is a copy of the cached dict, so it can be changed.
+
+    Inputs
+    ------
+    pfname      : str of pf name (on PFPATH) or path
+    sidecar_dir : str of directory for JSON sidecars (PF_SIDECAR_DIR)
+
+    """
+    stamps = pf_stamps(pfname)
+    if stamps is None:
+        # Not found on our PFPATH, let Antelope look for it
+        return _read_pf(pfname)
+    cached = _pfs.get(pfname)
+    if cached is None or cached[0] != stamps:
+        sidecar_dir = sidecar_dir or PF_SIDECAR_DIR
+        pf = None
+        if sidecar_dir:
+            sidecar = _sidecar(pfname, sidecar_dir)
+            pf = _read_sidecar(sidecar, stamps)
+        if pf is None:
+            pf = _read_pf(pfname)
+            if sidecar_dir:
+                _write_sidecar(sidecar, stamps, pf)
+        cached = _pfs[pfname] = (stamps, pf)
+    return copy.deepcopy(cached[1])
@@ -5,4 +5,5 @@ nsl.antelope.rows
 Custom rows for the DBAPI2 row factory
 
 """
+from nsl.antelope.rows.compact import CompactRow
 from nsl.antelope.rows.sql import SQLValuesRow
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+nsl.antelope.rows.compact
+
+Light read-only rows for the DBAPI2 row factory
+
+A CompactRow is a plain tuple of the record values with the field names
+kept once per cursor description, on a class shared by every row with
+the same fields. It supports the dict-style access of OrderedDictRow used
+by the converters (row['name'], row.get('name'), keys/values/items) at the
+cost of a tuple.
+
+"""
+from collections import OrderedDict
+
+try:
+    _string_types = basestring
+except NameError:
+    _string_types = str
+
+_row_classes = {}  # {(base class, tuple of field names): row class}
+
+
+class CompactRow(tuple):
+    """
+    A row_factory function to provide tuples with access by field name
+
+    Instance is a tuple of the values with dict-style methods. Fields
+    repeated in a join (e.g. 'lddate') map to the last one, as in a dict.
+
+    Methods
+    -------
+    get(name, default=None) : value of a field, or default
+    keys()   : list of field names
+    values() : list of values, in the same order as keys()
+    items()  : list of (name, value) pairs
+    _asdict() : OrderedDict of the row
+
+    Notes
+    -----
+    Integers and slices index the tuple, iterating gives the values, and
+    'in' checks the field names, like a dict.
+
+    """
+    __slots__ = ()
+    _fields = ()  # field names, in order, without repeats
+    _index = {}   # {field name: position in tuple}
+
+    def __new__(cls, cursor, row):
+        names = tuple(d[0] for d in cursor.description)
+        try:
+            class_ = _row_classes[(cls, names)]
+        except KeyError:
+            class_ = _row_classes[(cls, names)] = cls._make_class(names)
+        return tuple.__new__(class_, row)
+
+    @classmethod
+    def _make_class(cls, names):
+        """Return a subclass with the name lookups for a description"""
+        index = dict((name, n) for n, name in enumerate(names))
+        fields = tuple(name for n, name in enumerate(names) if name not in names[:n])
+        return type(cls.__name__, (cls,), {'__slots__': (), '_fields': fields, '_index': index})
+
+    def __getitem__(self, key):
+        try:
+            key = self._index[key]
+        except (KeyError, TypeError):
+            if isinstance(key, _string_types):
+                raise KeyError(key)
+        return tuple.__getitem__(self, key)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def get(self, name, default=None):
+        try:
+            return tuple.__getitem__(self, self._index[name])
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(self._fields)
+
+    def values(self):
+        return [tuple.__getitem__(self, self._index[name]) for name in self._fields]
+
+    def items(self):
+        return list(zip(self._fields, self.values()))
+
+    def _asdict(self):
+        return OrderedDict(self.items())
+
+    def __repr__(self):
+        return "{0}({1})".format(self.__class__.__name__,
+            ', '.join("{0}={1!r}".format(k, v) for k, v in self.items()))
+
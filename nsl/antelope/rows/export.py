@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+nsl.antelope.rows.export
+
+Bulk export of Datascope tables to SQL using SQLValuesRow
+
+Rows are read one at a time through a curds2 cursor and written out in
+chunks of multi-row INSERT statements, or as PostgreSQL COPY text, so
+memory use doesn't depend on the size of the table. INSERTs can be upserts
+on the primary key of the table, using the ON CONFLICT clause understood
+by PostgreSQL (9.5+) and SQLite (3.24+).
+
+Functions
+---------
+iter_rows(database, table, cmds=None) : SQLValuesRow of each record
+insert_statements(table, rows, ...) : multi-row INSERT statements
+copy_lines(rows) : lines of COPY text format
+export_table(database, table, out, ...) : write a table to a file
+export_to_dbapi(database, table, connection, ...) : load a table into a DB
+
+"""
+from itertools import islice
+from curds2.dbapi2 import connect
+from nsl.antelope.rows.sql import SQLValuesRow
+
+# Primary keys of the CSS3.0 tables we mirror
+PRIMARY_KEYS = {
+    'origin'  : ('orid',),
+    'origerr' : ('orid',),
+    'arrival' : ('arid',),
+    'assoc'   : ('arid', 'orid'),
+    'netmag'  : ('magid',),
+    'stamag'  : ('magid', 'sta'),
+    'event'   : ('evid',),
+    'fplane'  : ('mechid',),
+    'mt'      : ('mtid',),
+    }
+
+
+def _chunks(iterable, size):
+    """Yield lists of up to 'size' items from an iterable"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_rows(database, table, cmds=None):
+    """
+    Yield SQLValuesRow of each record of a Datascope table or view
+
+    Inputs
+    ------
+    database : str name of database
+    table    : str name of table, used if there are no cmds
+    cmds     : list of str of dbprocess commands, e.g. with a 'dbsubset'
+
+    """
+    conn = connect(database, row_factory=SQLValuesRow)
+    try:
+        conn.CONVERT_NULL = True
+        curs = conn.cursor()
+        if cmds:
+            curs.execute('process', [cmds])
+        else:
+            curs.execute.lookup(table=table)
+        for row in curs:
+            yield row
+    finally:
+        conn.close()
+
+
+def insert_statements(table, rows, chunksize=1000, upsert=True, keys=None):
+    """
+    Yield multi-row INSERT statements for SQLValuesRow rows
+
+    Inputs
+    ------
+    table     : str name of SQL table
+    rows      : iterable of SQLValuesRow
+    chunksize : int of max number of rows per statement (1000)
+    upsert    : bool of whether to update rows which already exist (True)
+    keys      : seq of str of key columns (PRIMARY_KEYS of table)
+
+    """
+    if keys is None:
+        keys = PRIMARY_KEYS.get(table)
+    for chunk in _chunks(rows, chunksize):
+        columns = chunk[0]._fields
+        sql = "INSERT INTO {0} ({1}) VALUES\n{2}".format(table,
+            ', '.join(columns), ',\n'.join(str(row) for row in chunk))
+        if upsert and keys:
+            updates = ["{0}=EXCLUDED.{0}".format(c) for c in columns if c not in keys]
+            if updates:
+                sql += "\nON CONFLICT ({0}) DO UPDATE SET {1}".format(
+                    ', '.join(keys), ', '.join(updates))
+            else:
+                sql += "\nON CONFLICT ({0}) DO NOTHING".format(', '.join(keys))
+        yield sql + ';'
+
+
+def _copy_field(value):
+    """
+    Convert an SQL value string to a field of the COPY text format
+    """
+    if value == 'NULL':
+        return r'\N'
+    if value.startswith("'"):
+        value = value[1:-1].replace("''", "'")
+    return (value.replace('\\', '\\\\').replace('\t', '\\t')
+                 .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def copy_lines(rows):
+    """
+    Yield lines of PostgreSQL COPY text format for SQLValuesRow rows
+
+    Use with e.g. "COPY origin (<columns>) FROM STDIN", the columns are
+    the '_fields' of the rows.
+
+    """
+    for row in rows:
+        yield '\t'.join(_copy_field(v) for v in row) + '\n'
+
+
+def export_table(database, table, out, format='insert', chunksize=1000,
+                 upsert=True, cmds=None):
+    """
+    Write a Datascope table to a file as SQL
+
+    Inputs
+    ------
+    database  : str name of database
+    table     : str name of table
+    out       : file-like object open for writing
+    format    : str of 'insert' (INSERT statements) or 'copy' (COPY text)
+    chunksize : int of rows per INSERT statement (1000)
+    upsert    : bool of whether INSERTs update existing rows (True)
+    cmds      : list of str of dbprocess commands to select the rows
+
+    Returns : int of number of rows written
+
+    """
+    counter = _Counter(iter_rows(database, table, cmds=cmds))
+    if format == 'copy':
+        lines = copy_lines(counter)
+    elif format == 'insert':
+        lines = (s + '\n' for s in insert_statements(table, counter, chunksize, upsert))
+    else:
+        raise ValueError("format must be 'insert' or 'copy', not {0!r}".format(format))
+    for line in lines:
+        out.write(line)
+    return counter.count
+
+
+def export_to_dbapi(database, table, connection, chunksize=1000, upsert=True,
+                    cmds=None):
+    """
+    Load a Datascope table into a table of another DBAPI2 database
+
+    The target table must exist. Each chunk is committed when done.
+
+    Inputs
+    ------
+    database   : str name of Datascope database
+    table      : str name of table (same in both databases)
+    connection : open DBAPI2 connection (e.g. psycopg2, sqlite3)
+    chunksize  : int of rows per INSERT statement (1000)
+    upsert     : bool of whether to update existing rows (True)
+    cmds       : list of str of dbprocess commands to select the rows
+
+    Returns : int of number of rows loaded
+
+    """
+    counter = _Counter(iter_rows(database, table, cmds=cmds))
+    curs = connection.cursor()
+    for sql in insert_statements(table, counter, chunksize, upsert):
+        curs.execute(sql)
+        connection.commit()
+    return counter.count
+
+
+class _Counter(object):
+    """Iterator wrapper counting the items passed through"""
+    def __init__(self, iterable):
+        self._iterator = iter(iterable)
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = next(self._iterator)
+        self.count += 1
+        return item
+
+    next = __next__
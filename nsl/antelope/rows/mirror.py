@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+nsl.antelope.rows.mirror
+
+Incremental mirroring of Datascope tables to SQL
+
+Each poll only exports the rows loaded or changed since the last one,
+found by the 'lddate' watermark of each table, as upserts. The
+watermark only moves up to LDDATE_LAG seconds before the poll, so rows
+still being loaded in the same second are picked up by the next poll,
+and only the last few seconds of rows are ever sent twice. Deleted rows
+are found with a row count and checksums of the keys in buckets of the
+first key column (e.g. 1000 orids), kept in a JSON state file, so the
+state stays small however big the table is. Buckets with changed rows
+are recounted, and if the table count doesn't add up, the buckets whose
+checksums don't match are rescanned and cleared of deleted rows with one
+DELETE each. Rescans only read the key columns.
+
+Classes
+-------
+MirrorState : dict of per-table watermarks, counts and key checksums
+
+Functions
+---------
+iter_keys(database, table, keys, ...) : key values, reading only keys
+mirror_table(database, table, state, ...) : SQL statements for one poll
+mirror(database, tables, statefile, ...) : poll tables and apply/write SQL
+
+"""
+import json
+import os
+import time
+import zlib
+
+from curds2.dbapi2 import connect
+from obspy.core.utcdatetime import UTCDateTime
+
+import nsl.common.logging as logging
+from nsl.common.util import save_json
+from nsl.antelope.rows.export import PRIMARY_KEYS, iter_rows, insert_statements
+from nsl.antelope.rows.sql import _sql_value_str
+
+LOG = logging.customLogger(__name__)
+
+BUCKET_SIZE = 1000  # values of the first key column per checksum bucket
+MAX_RANGES = 50     # most buckets to select with one dbsubset
+LDDATE_LAG = 10.    # s, rows newer than this at a poll are sent again next time
+
+
+class MirrorState(dict):
+    """
+    Persistent state of a mirror
+
+    {table: {'lddate': float of watermark, 'nrecs': int of row count,
+             'buckets': {str of bucket: [int of count, int of checksum]}}}
+
+    """
+    filename = None
+
+    def __init__(self, filename):
+        super(MirrorState, self).__init__()
+        self.filename = filename
+        if os.path.exists(filename):
+            with open(filename) as f:
+                self.update(json.load(f))
+
+    def table(self, name):
+        """Return the state of a table, adding an empty one if new"""
+        return self.setdefault(name, {'lddate': None, 'nrecs': 0, 'buckets': {}})
+
+    def save(self):
+        """
+        Write state to file, replacing the old file in one step
+        """
+        save_json(self, self.filename, sort_keys=True)
+
+
+def _nrecs(database, table):
+    """Return number of records in a table"""
+    conn = connect(database)
+    try:
+        return conn.cursor().execute.lookup(table=table)
+    finally:
+        conn.close()
+
+
+def _timestamp(value):
+    """Return epoch float of an SQL lddate value string"""
+    try:
+        return float(value)
+    except ValueError:
+        return UTCDateTime(value.strip("'")).timestamp
+
+
+def _bucket(value, bucket_size=BUCKET_SIZE):
+    """Return str of bucket of an SQL str value of the first key column"""
+    return str(int(value) // bucket_size)
+
+
+def _checksum(key):
+    """Return int checksum of a tuple of SQL str key values"""
+    return zlib.crc32(','.join(key).encode('utf-8')) & 0xffffffff
+
+
+def _range(column, bucket, bucket_size=BUCKET_SIZE, sql=False):
+    """Return expression selecting the rows of a bucket"""
+    lo = int(bucket) * bucket_size
+    return "{0} >= {1} {3} {0} < {2}".format(column, lo, lo + bucket_size,
+                                             'AND' if sql else '&&')
+
+
+def iter_keys(database, table, keys, buckets=None, bucket_size=BUCKET_SIZE):
+    """
+    Yield tuples of SQL str key values of a table, reading only the keys
+
+    Inputs
+    ------
+    database    : str name of database
+    table       : str name of table
+    keys        : seq of str of key columns, the first one an integer
+    buckets     : set of str of buckets to yield keys of (None -> all)
+    bucket_size : int of key values per bucket (BUCKET_SIZE)
+
+    """
+    if buckets is not None and not buckets:
+        return
+    cmds = ['dbopen {0}'.format(table)]
+    if buckets is not None and len(buckets) <= MAX_RANGES:
+        cmds.append('dbsubset ' + ' || '.join('(' + _range(keys[0], b, bucket_size) + ')'
+                                             for b in sorted(buckets, key=int)))
+    # a group view holds only the key fields (and the bundle)
+    cmds.append('dbgroup ' + ' '.join(keys))
+    conn = connect(database)
+    try:
+        curs = conn.cursor()
+        curs.execute('process', [cmds])
+        nkeys = len(keys)
+        for row in curs:
+            key = tuple(_sql_value_str(v) for v in row[:nkeys])
+            if buckets is None or _bucket(key[0], bucket_size) in buckets:
+                yield key
+    finally:
+        conn.close()
+
+
+def _bucket_sums(keys, bucket_size=BUCKET_SIZE, collect=()):
+    """
+    Return {bucket: [count, checksum]} of key tuples, and {bucket: list of
+    keys} of the buckets in 'collect'
+    """
+    sums = {}
+    present = {}
+    for key in keys:
+        b = _bucket(key[0], bucket_size)
+        s = sums.setdefault(b, [0, 0])
+        s[0] += 1
+        s[1] ^= _checksum(key)
+        if b in collect:
+            present.setdefault(b, []).append(key)
+    return sums, present
+
+
+def delete_statement(table, keys, bucket, present, bucket_size=BUCKET_SIZE):
+    """
+    Return DELETE statement for the rows of a bucket not in the table
+
+    Inputs
+    ------
+    table       : str name of SQL table
+    keys        : seq of str of key columns
+    bucket      : str of bucket
+    present     : seq of tuples of SQL str key values still in the bucket
+    bucket_size : int of key values per bucket (BUCKET_SIZE)
+
+    """
+    where = _range(keys[0], bucket, bucket_size, sql=True)
+    if present and len(keys) == 1:
+        where += " AND {0} NOT IN ({1})".format(keys[0], ', '.join(k[0] for k in present))
+    elif present:
+        where += " AND ({0}) NOT IN ({1})".format(', '.join(keys),
+            ', '.join('(' + ', '.join(k) + ')' for k in present))
+    return "DELETE FROM {0} WHERE {1};".format(table, where)
+
+
+def mirror_table(database, table, state, chunksize=1000, keys=None,
+                 bucket_size=BUCKET_SIZE):
+    """
+    Yield SQL statements bringing a mirror of a table up to date
+
+    The table state is updated once all statements have been yielded, so
+    a poll which is stopped part way is simply repeated next time.
+
+    Inputs
+    ------
+    database    : str name of database
+    table       : str name of table
+    state       : MirrorState
+    chunksize   : int of max rows per INSERT statement (1000)
+    keys        : seq of str of key columns (PRIMARY_KEYS of table)
+    bucket_size : int of key values per checksum bucket (BUCKET_SIZE)
+
+    """
+    if keys is None:
+        keys = PRIMARY_KEYS[table]
+    tstate = state.table(table)
+    if 'keys' in tstate:
+        # state from before key checksums
+        tstate['buckets'] = _bucket_sums(tstate.pop('keys'), bucket_size)[0]
+    old = tstate['buckets']
+    nrecs = _nrecs(database, table)
+    # 1. Upsert rows changed since the watermark
+    cmds = None
+    if tstate['lddate'] is not None:
+        cmds = ['dbopen {0}'.format(table),
+                'dbsubset lddate > {0!r}'.format(tstate['lddate'])]
+    settled = time.time() - LDDATE_LAG
+    touched = set()
+    changed = [0]
+    lddate = [tstate['lddate']]
+
+    def track(rows):
+        for row in rows:
+            changed[0] += 1
+            touched.add(_bucket(getattr(row, keys[0]), bucket_size))
+            if row.lddate != 'NULL':
+                t = _timestamp(row.lddate)
+                if t <= settled and (lddate[0] is None or t > lddate[0]):
+                    lddate[0] = t
+            yield row
+
+    for sql in insert_statements(table, track(iter_rows(database, table, cmds)),
+                                 chunksize, upsert=True, keys=keys):
+        yield sql
+    # 2. Recount the buckets with changed rows, which can have deletes too
+    recount = touched & set(old)
+    sums, present = _bucket_sums(iter_keys(database, table, keys, touched, bucket_size),
+                                 bucket_size, collect=recount)
+    for b in sorted(recount, key=int):
+        yield delete_statement(table, keys, b, present.get(b), bucket_size)
+    buckets = dict(old)
+    for b in touched:
+        if b in sums:
+            buckets[b] = sums[b]
+        else:
+            buckets.pop(b, None)
+    # 3. Rescan buckets whose checksums are off, only if the count is
+    stale = set()
+    if nrecs != sum(c for c, _ in buckets.values()):
+        current = _bucket_sums(iter_keys(database, table, keys), bucket_size)[0]
+        stale = set(b for b in set(buckets) | set(current)
+                    if buckets.get(b) != current.get(b))
+        cleared = stale & set(buckets)
+        present = _bucket_sums(iter_keys(database, table, keys, cleared, bucket_size),
+                               bucket_size, collect=cleared)[1]
+        for b in sorted(cleared, key=int):
+            yield delete_statement(table, keys, b, present.get(b), bucket_size)
+        buckets = current
+    LOG.info("{0}: {1} changed, {2} buckets recounted, {3} rescanned".format(
+        table, changed[0], len(touched), len(stale)))
+    tstate.update(lddate=lddate[0], nrecs=nrecs, buckets=buckets)
+
+
+def mirror(database, tables, statefile, out=None, connection=None,
+           chunksize=1000, interval=None):
+    """
+    Mirror Datascope tables to SQL, writing or applying the changes
+
+    Inputs
+    ------
+    database   : str name of Datascope database
+    tables     : seq of str of table names (with PRIMARY_KEYS)
+    statefile  : str of filename to keep the mirror state in
+    out        : file-like object to write SQL statements to
+    connection : open DBAPI2 connection to run SQL statements on
+    chunksize  : int of max rows per statement (1000)
+    interval   : float of seconds between polls (None -> poll once)
+
+    Notes
+    -----
+    Statements for a table are committed (or written) before its state is
+    saved, so the mirror is never behind the state file.
+
+    """
+    state = MirrorState(statefile)
+    while True:
+        for table in tables:
+            if connection is not None:
+                curs = connection.cursor()
+            for sql in mirror_table(database, table, state, chunksize):
+                if connection is not None:
+                    curs.execute(sql)
+                if out is not None:
+                    out.write(sql + '\n')
+            if connection is not None:
+                connection.commit()
+            if out is not None:
+                out.flush()
+            state.save()
+        if interval is None:
+            return
+        time.sleep(interval)
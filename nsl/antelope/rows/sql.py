@@ -4,26 +4,50 @@ from obspy.core import UTCDateTime
 
 dbapi2.TimestampFromTicks = UTCDateTime
 
+# Row classes and column formatters by (class, description)
+_row_classes = {}
+
+
+def _sql_value_str(value):
+    """
+    Convert a value to a string suitable for an sql statement
+    """
+    # Format everything not a string or to be stringified
+    if value is None:
+        return 'NULL'
+    if isinstance(value, str):
+        return "'{0}'".format(value.replace("'","''"))
+    return str(value)
+
+
+def _sql_datetime_str(value):
+    """
+    Convert a value of a DATETIME column to a string suitable for an sql statement
+    """
+    if isinstance(value, float):
+        value = str(dbapi2.TimestampFromTicks(value))
+    elif isinstance(value, UTCDateTime):
+        value = str(value)
+    #TODO: add datetimet too?
+    return _sql_value_str(value)
+
+
 class _SQLValues(object):
     @staticmethod
-    def _sql_str(value, desc):
+    def _formatter(desc):
         """
-        Convert a value to a string suitable for an sql statement
+        Return the function converting values of a column to SQL strings
         """
-        # Format everything not a string or to be stringified
-        if value is None:
-            return 'NULL'
-        
         if desc.type_code == dbapi2.DATETIME:
-            if isinstance(value, float):
-                value = str(dbapi2.TimestampFromTicks(value))
-            elif isinstance(value, UTCDateTime):
-                value = str(value)
-            #TODO: add datetimet too?
+            return _sql_datetime_str
+        return _sql_value_str
 
-        if isinstance(value, str):
-            return "'{0}'".format(value.replace("'","''"))
-        return str(value)
+    @classmethod
+    def _sql_str(cls, value, desc):
+        """
+        Convert a value to a string suitable for an sql statement
+        """
+        return cls._formatter(desc)(value)
 
     @classmethod
     def _values(cls, row, description):
@@ -71,10 +95,25 @@ class SQLValuesRow(_SQLValues):
     
     """
     def __new__(cls, cursor, row):
-        description = cursor.description
+        class_, formatters = cls._row_class(cursor.description)
+        return class_._make([f(r) for f, r in zip(formatters, row)])
+
+    @classmethod
+    def _row_class(cls, description):
+        """
+        Return the namedtuple class and column formatters for a description,
+        made once and cached for every row of the same fields
+        """
+        key = (cls, tuple((d.name, d.type_code == dbapi2.DATETIME) for d in description))
+        try:
+            return _row_classes[key]
+        except KeyError:
+            pass
         Tuple = collections.namedtuple(cls.__name__, [d.name.replace('.','_') for d in description])
-        class_ = type(cls.__name__, (_SQLValues, Tuple,), {})
-        return class_(*super(SQLValuesRow, cls)._values(row, description))
+        class_ = type(cls.__name__, (_SQLValues, Tuple,), {'__slots__': ()})
+        formatters = tuple(cls._formatter(d) for d in description)
+        _row_classes[key] = class_, formatters
+        return class_, formatters
 
 #
 #---------------------------------------------------------------------#
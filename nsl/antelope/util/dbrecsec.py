@@ -6,23 +6,104 @@ dbrecsec.py script
 
 """
 import os
+import getopt
+import pickle
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+from multiprocessing.util import Finalize
 
 import numpy
 import obspy.core
-from matplotlib import pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from scipy import signal
 
 import curds2 as dbapi2
 import nsl.common.logging as logging
+from nsl.common.cache import LRUFileCache
+from nsl.obspy.mseed import MSEEDReader, INDEX_DIR
 
 LOG = logging.customLogger(__name__)
 
 T_PRE = 5.
 T_POST = 55.
 
+HIGHPASS = 1.0  # Hz
+CORNERS = 4
+TAPER = 0.05    # fraction of trace tapered at each end
+FILTER_BANDS = ('B', 'H', 'D')  # band codes of channels to filter
+# (freq, corners, taper, filter_bands) of preprocess_stream, part of cache keys
+PREPROCESS = (HIGHPASS, CORNERS, TAPER, FILTER_BANDS)
 
-def db2stream(dbname, orid, t_pre=T_PRE, t_post=T_POST):
+EARTH_RADIUS = 6371.  # km
+
+_site_geometry = {}  # {dbname: (site table mtime, {sta: (lat, lon)})}
+
+
+def _read_window(reader, fpath, t0, t1, foff):
+    """Return obspy.Stream of a wfdisc window"""
+    try:
+        return reader.read(fpath, t0, t1, foff=foff)
+    except ValueError:
+        # Not miniSEED, read the whole file
+        _st = obspy.core.read(fpath, starttime=t0, endtime=t1)
+        if len(_st) > 1:
+            _st.merge()
+        return _st
+
+
+def _cached_window(cache, reader, fpath, t0, t1, foff, sta, chan,
+                   params=PREPROCESS):
+    """
+    Return preprocessed obspy.Stream of a wfdisc window, from the cache
+    if it has been done before
+
+    The size and mtime of the file are part of the key, so a window of a
+    file still being written to is read again once more data is in, and
+    empty windows are not cached at all.
+    """
+    try:
+        stat = os.stat(fpath)
+    except OSError:
+        return preprocess_stream(_read_window(reader, fpath, t0, t1, foff), *params)
+    key = ('recsec', sta, chan, t0.timestamp, t1.timestamp, params, fpath,
+           stat.st_size, stat.st_mtime)
+    value = cache.get(key)
+    if value is not None:
+        return pickle.loads(value)
+    st = preprocess_stream(_read_window(reader, fpath, t0, t1, foff), *params)
+    if st:
+        cache.put(key, pickle.dumps(st, protocol=2))
+    return st
+
+
+def db2stream(dbname, orid, t_pre=T_PRE, t_post=T_POST, index_dir=INDEX_DIR,
+              mmap=False, workers=None, cache=None):
     """
     Return obspy.Stream of waveforms around p-arrival for a given orid
+
+    miniSEED files are read through a record index (cached in 'index_dir',
+    None for no disk cache), so only the records in the window are read,
+    and each file is opened once. With 'mmap', files are memory-mapped and
+    the records decoded straight into the trace arrays.
+
+    With 'workers', windows are read by that many threads at once (file
+    reads and decoding release the GIL), traces are still in 'delta' order.
+
+    With a 'cache' (nsl.common.cache.LRUFileCache), the traces are returned
+    already run through preprocess_stream, and each window is kept in the
+    cache by station, channel, time window and filter parameters, so it is
+    only read and filtered once. Plot them with preprocess=False.
+    """
+    with dbapi2.connect(dbname) as conn, MSEEDReader(index_dir, mmap=mmap) as reader:
+        return _db2stream(conn, reader, dbname, orid, t_pre, t_post, workers, cache)
+
+
+def _db2stream(conn, reader, dbname, orid, t_pre=T_PRE, t_post=T_POST,
+               workers=None, cache=None):
+    """
+    Return obspy.Stream for an orid using an open connection and reader
     """
     DBPROCESS_CMDS = ('process', [('dbopen assoc', 
                       'dbjoin -o arrival', 
@@ -30,68 +111,307 @@ def db2stream(dbname, orid, t_pre=T_PRE, t_post=T_POST):
                       'dbsubset iphase=~/P.*/',
                       'dbjoin wfdisc sta chan',
                       'dbsubset arrival.time <= wfdisc.endtime && arrival.time >= wfdisc.time',
-                      'dbgroup sta chan time delta dir dfile',
+                      'dbgroup sta chan time delta dir dfile foff',
                       'dbsort -r delta',
                       )])
     
     st = obspy.core.Stream()
     dbpath = os.path.abspath(os.path.dirname(dbname))
-    with dbapi2.connect(dbname) as conn:
-        curs = conn.cursor(CONVERT_NULL=True, row_factory=dbapi2.OrderedDictRow)
-        nrecs = curs.execute(*DBPROCESS_CMDS)
-        LOG.debug('Number of picks/waveforms: {0}'.format(nrecs))
-        for c in curs:
-            fpath = os.path.join(dbpath, c['dir'], c['dfile'])
-            t0 = obspy.core.UTCDateTime(c['time']-t_pre)
-            t1 = obspy.core.UTCDateTime(c['time']+t_post)
-            _st = obspy.core.read(fpath, starttime=t0, endtime=t1)
-            if len(_st) > 1:
-                _st.merge()
-            st += _st
+    curs = conn.cursor(CONVERT_NULL=True, row_factory=dbapi2.OrderedDictRow)
+    nrecs = curs.execute(*DBPROCESS_CMDS)
+    LOG.debug('Number of picks/waveforms: {0}'.format(nrecs))
+    windows = [(reader,
+                os.path.join(dbpath, c['dir'], c['dfile']),
+                obspy.core.UTCDateTime(c['time']-t_pre),
+                obspy.core.UTCDateTime(c['time']+t_post),
+                c['foff'], c['sta'], c['chan']) for c in curs]
+    if cache is not None:
+        read = lambda w: _cached_window(cache, *w)
+    else:
+        read = lambda w: _read_window(*w[:5])
+    if workers:
+        pool = ThreadPool(workers)
+        try:
+            streams = pool.map(read, windows)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        streams = [read(w) for w in windows]
+    for _st in streams:
+        st += _st
     return st
 
 
-def plot_stream_recsec(st, time_offset=T_PRE, trace_distance=2):
+def site_geometry(dbname):
+    """
+    Return dict of {sta: (lat, lon)} of all stations in the site table
+
+    Read once per process and kept until the site table file changes. For
+    stations with several epochs, the one with the latest ondate is used.
+    """
+    try:
+        stamp = os.stat(dbname + '.site').st_mtime
+    except OSError:
+        stamp = None  # e.g. site from a descriptor path, keep what we have
+    cached = _site_geometry.get(dbname)
+    if cached is not None and (stamp is None or cached[0] == stamp):
+        return cached[1]
+    with dbapi2.connect(dbname) as conn:
+        curs = conn.cursor(row_factory=dbapi2.OrderedDictRow)
+        curs.execute('process', [('dbopen site', 'dbsort sta ondate')])
+        geometry = dict((c['sta'], (c['lat'], c['lon'])) for c in curs)
+    _site_geometry[dbname] = (stamp, geometry)
+    return geometry
+
+
+def _origin(conn, orid):
+    """Return (lat, lon, time) of an origin"""
+    curs = conn.cursor(row_factory=dbapi2.OrderedDictRow)
+    if not curs.execute('process', [('dbopen origin', 'dbsubset orid=={0}'.format(orid))]):
+        raise ValueError("No origin with orid {0}".format(orid))
+    c = curs.fetchone()
+    return c['lat'], c['lon'], c['time']
+
+
+def epicentral_distances(lat, lon, stations, geometry):
+    """
+    Return array of great circle distances (km) from a point to stations
+
+    Inputs
+    ------
+    lat, lon : float of epicenter
+    stations : seq of str of station names
+    geometry : dict of {sta: (lat, lon)} (see site_geometry)
+
+    Returns : numpy.ndarray of km, NaN for stations not in geometry
+
+    """
+    coords = numpy.array([geometry.get(sta, (numpy.nan, numpy.nan)) for sta in stations],
+                         dtype=numpy.float64).reshape(-1, 2)
+    lat1, lon1 = numpy.radians(lat), numpy.radians(lon)
+    lat2, lon2 = numpy.radians(coords[:, 0]), numpy.radians(coords[:, 1])
+    h = (numpy.sin((lat2 - lat1) / 2) ** 2 +
+         numpy.cos(lat1) * numpy.cos(lat2) * numpy.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS * numpy.arcsin(numpy.sqrt(numpy.minimum(h, 1.)))
+
+
+def _highpass(data, sampling_rate, freq=HIGHPASS, corners=CORNERS):
+    """Butterworth highpass filter rows of a 2-D array (in place)"""
+    wn = freq / (0.5 * sampling_rate)
+    if wn >= 1.:
+        return data
+    if hasattr(signal, 'sosfilt'):
+        sos = signal.butter(corners, wn, btype='highpass', output='sos')
+        data[:] = signal.sosfilt(sos, data, axis=1)
+    else:
+        b, a = signal.butter(corners, wn, btype='highpass')
+        data[:] = signal.lfilter(b, a, data, axis=1)
+    return data
+
+
+def _taper_window(npts, max_percentage=TAPER):
+    """Return cosine taper window with each side max_percentage of npts"""
+    wlen = int(max_percentage * npts)
+    window = numpy.ones(npts)
+    if wlen:
+        sides = numpy.hanning(2 * wlen + 1)
+        window[:wlen] = sides[:wlen]
+        window[-wlen:] = sides[-wlen:]
+    return window
+
+
+def preprocess_stream(st, freq=HIGHPASS, corners=CORNERS, taper=TAPER,
+                      filter_bands=FILTER_BANDS):
+    """
+    Return new obspy.Stream of traces prepared for a record section
+
+    Every trace is demeaned and normalized to a peak of 1, and traces of
+    channels with a band code in 'filter_bands' are highpass filtered and
+    tapered. Traces with the same sampling rate and length are stacked
+    into a 2-D array and done in one go. The input Stream is not changed.
+
+    Inputs
+    ------
+    st           : obspy.Stream
+    freq         : float of highpass corner frequency (HIGHPASS)
+    corners      : int of filter corners (CORNERS)
+    taper        : float of fraction of trace to taper at each end (TAPER)
+    filter_bands : seq of str of band codes of channels to filter
+
+    """
+    groups = {}
+    for n, tr in enumerate(st):
+        groups.setdefault((tr.stats.sampling_rate, tr.stats.npts), []).append(n)
+    out = [None] * len(st)
+    for (rate, npts), members in groups.items():
+        data = numpy.array([st[n].data for n in members], dtype=numpy.float64)
+        data -= data.mean(axis=1)[:, None]
+        peak = numpy.abs(data).max(axis=1)
+        peak[peak == 0] = 1.
+        data /= peak[:, None]
+        filt = numpy.array([st[n].stats.channel[:1] in filter_bands for n in members])
+        if filt.any() and npts:
+            data[filt] = _highpass(data[filt], rate, freq, corners)
+            data[filt] *= _taper_window(npts, taper)
+        for n, d in zip(members, data):
+            out[n] = obspy.core.Trace(data=d, header=st[n].stats.copy())
+    return obspy.core.Stream(traces=out)
+
+
+def minmax_indices(data, nbins):
+    """
+    Return indices of the min and max of each of 'nbins' bins of 'data'
+
+    Indices are in time order, so plotting data[indices] draws the same
+    envelope as the whole trace at a resolution of 'nbins' (e.g. pixels).
+    If there are fewer than 2 samples per bin, all indices are returned.
+    """
+    npts = data.size
+    if nbins < 1 or npts <= 2 * nbins:
+        return numpy.arange(npts)
+    step = -(-npts // nbins)
+    nbins = -(-npts // step)
+    padded = numpy.empty(nbins * step, dtype=data.dtype)
+    padded[:npts] = data
+    padded[npts:] = data[-1]
+    bins = padded.reshape(nbins, step)
+    offsets = numpy.arange(nbins)[:, None] * step
+    idx = numpy.sort(numpy.column_stack((bins.argmin(axis=1), bins.argmax(axis=1))), axis=1)
+    return numpy.minimum(idx + offsets, npts - 1).ravel()
+
+
+def plot_stream_recsec(st, time_offset=T_PRE, trace_distance=2, font_size=20,
+                       decimate=True, fig=None, preprocess=True, distances=None,
+                       origin_time=None, reduction_velocity=None):
     """
     Return a figure containing record section plot given an obspy Stream
+
+    The figure is drawn without pyplot on an Agg canvas, with all traces
+    in one LineCollection. With 'decimate', each trace is cut down to the
+    min and max of each pixel column of the axes, which looks the same
+    but draws far fewer points.
+
+    Pass a figure from an earlier call as 'fig' to clear and redraw it
+    instead of making a new one. Traces are run through preprocess_stream
+    unless 'preprocess' is False (e.g. from db2stream with a cache).
+
+    Distance mode
+    -------------
+    With 'distances' (km, one per trace) and 'origin_time', traces are
+    placed at their epicentral distance against time from the origin,
+    reduced by distance/'reduction_velocity' (km/s) if given. Traces are
+    scaled to 'trace_distance' km, or to the mean spacing of the stations
+    if it is None.
     """
     bb = 'blue'
     sp = 'black'
     x = 'green'
     color = {'B': bb, 'H': bb, 'E': sp, 'S': sp, 'default':x}
     
-    fig = plt.figure(figsize=(16.5, 12.75))
-    ax = fig.add_subplot(111)
+    if fig is None:
+        fig = Figure(figsize=(16.5, 12.75))
+        FigureCanvasAgg(fig)
+    if fig.axes:
+        ax = fig.axes[0]
+        ax.cla()
+        for other in fig.axes[1:]:
+            fig.delaxes(other)
+    else:
+        ax = fig.add_subplot(111)
+    npix = int(ax.bbox.width) if decimate else 0
+    if distances is not None:
+        distances = numpy.asarray(distances, dtype=numpy.float64)
+        if trace_distance is None:
+            span = distances.max() - distances.min() if distances.size else 0.
+            trace_distance = span / max(distances.size - 1, 1) or 1.
     ytics = []
     yticlabels = []
+    segments = []
+    colors = []
+    times = {}  # {(rate, npts): time axis}
+    if preprocess:
+        st = preprocess_stream(st)
     for n, tr in enumerate(st):
         sta = tr.stats.station
         chan = tr.stats.channel
-        t = numpy.arange(tr.data.size) / tr.stats.sampling_rate - time_offset
-        tr.data = tr.data.astype(numpy.float64)
-        tr.data -= tr.data.mean()
-        tr.data /= numpy.amax(numpy.abs(tr.data))
-        if chan[0] in ('B', 'H', 'D'):
-            tr.filter('highpass', freq=1.0)
-            try:
-                tr.taper(max_percentage=0.05, type='cosine')
-            except:
-                tr.taper()  # depricated, but needed for now
-        ypos = trace_distance * n
-        tr.data += ypos
+        key = (tr.stats.sampling_rate, tr.stats.npts)
+        if key not in times:
+            times[key] = numpy.arange(tr.stats.npts) / tr.stats.sampling_rate
+        if distances is None:
+            t = times[key] - time_offset
+            ypos = trace_distance * n
+            amp = 1.
+        else:
+            ypos = distances[n]
+            shift = tr.stats.starttime - origin_time
+            if reduction_velocity:
+                shift -= ypos / reduction_velocity
+            t = times[key] + shift
+            amp = trace_distance / 2.
         ytics.append(ypos)
         yticlabels.append(' '.join([sta, chan]))
-        ax.plot(t, tr.data, linewidth=0.5, color=color.get(chan[0], color['default']))
-    ax.set_xlim(t[0],t[-1])
-    ax.set_xlabel("Time from P-arrival (s)")
-    ax.set_ylim(0-trace_distance, ypos+trace_distance)
-    ax.set_yticks(ytics)
-    ax.set_yticklabels(yticlabels, fontsize=20, fontweight='bold')
+        idx = minmax_indices(tr.data, npix)
+        segments.append(numpy.column_stack((t[idx], amp * tr.data[idx] + ypos)))
+        colors.append(color.get(chan[0], color['default']))
+    ax.add_collection(LineCollection(segments, colors=colors, linewidths=0.5))
+    if distances is None:
+        ax.set_xlim(t[0],t[-1])
+        ax.set_xlabel("Time from P-arrival (s)")
+        ax.set_ylim(0-trace_distance, ypos+trace_distance)
+        ax.set_yticks(ytics)
+        ax.set_yticklabels(yticlabels, fontsize=font_size, fontweight='bold')
+    else:
+        ax.set_xlim(min(seg[0, 0] for seg in segments), max(seg[-1, 0] for seg in segments))
+        if reduction_velocity:
+            ax.set_xlabel("Reduced time, T - X/({0:g} km/s) (s)".format(reduction_velocity))
+        else:
+            ax.set_xlabel("Time from origin (s)")
+        ax.set_ylim(min(ytics) - trace_distance, max(ytics) + trace_distance)
+        ax.set_ylabel("Epicentral distance (km)")
+        right = ax.twinx()
+        right.set_ylim(ax.get_ylim())
+        right.set_yticks(ytics)
+        right.set_yticklabels(yticlabels, fontsize=max(font_size // 2, 6))
     ax.grid(True, axis='x')
     return fig
 
 
-def dbrecsec(dbname, orid, filename=None):
+def _distance_section(conn, dbname, orid, st):
+    """
+    Return (stream, distances, origin time) for a distance mode plot,
+    with traces sorted by distance and stations not in site dropped
+    """
+    lat, lon, time = _origin(conn, orid)
+    distances = epicentral_distances(lat, lon, [tr.stats.station for tr in st],
+                                     site_geometry(dbname))
+    order = [n for n in numpy.argsort(distances, kind='mergesort')
+             if not numpy.isnan(distances[n])]
+    st = obspy.core.Stream(traces=[st[n] for n in order])
+    return st, distances[order], obspy.core.UTCDateTime(time)
+
+
+def _recsec(conn, reader, dbname, orid, filename, fig=None, cache=None,
+            distance=False, reduction_velocity=None, workers=None):
+    """
+    Plot and save the record section of an orid using an open connection,
+    reader and (optionally) figure. Returns the filename, None if no traces.
+    """
+    st = _db2stream(conn, reader, dbname, orid, workers=workers, cache=cache)
+    kw = {'fig': fig, 'preprocess': cache is None}
+    if st and (distance or reduction_velocity):
+        st, distances, origin_time = _distance_section(conn, dbname, orid, st)
+        kw.update(distances=distances, origin_time=origin_time,
+                  reduction_velocity=reduction_velocity, trace_distance=None)
+    if not st:
+        return None
+    fig = plot_stream_recsec(st, **kw)
+    fig.savefig(filename)
+    return filename
+
+
+def dbrecsec(dbname, orid, filename=None, cache=None, distance=False,
+             reduction_velocity=None, workers=None):
     """
     Save a bitmap of waveform plot given dbname/orid
 
@@ -100,28 +420,160 @@ def dbrecsec(dbname, orid, filename=None):
     dbname : str of Antelope database
     orid : str of orid
     filename : str of desired filename ("waveforms_[orid].png")
+    cache : nsl.common.cache.LRUFileCache of preprocessed windows (None)
+    distance : bool of whether to place traces by epicentral distance
+    reduction_velocity : float of km/s to reduce times by (implies distance)
+    workers : int of threads to read waveforms with (None -> one at a time)
     """
-    st = db2stream(dbname, orid)
-    if st:
-        fig = plot_stream_recsec(st)
-        if not filename:
-            filename = "waveforms_{0}.png".format(orid)
-        fig.savefig(filename)
-        return filename
-    else:
+    if not filename:
+        filename = "waveforms_{0}.png".format(orid)
+    with dbapi2.connect(dbname) as conn, MSEEDReader(INDEX_DIR) as reader:
+        fn = _recsec(conn, reader, dbname, orid, filename, cache=cache,
+                     distance=distance, reduction_velocity=reduction_velocity,
+                     workers=workers)
+    if fn is None:
         LOG.info("No traces in stream for {0} {1}".format(dbname, orid))
-        return None
+    return fn
+
+
+#
+# Batch plotting
+#
+_worker_state = None  # (dbname, connection, reader, figure, cache) of each worker
 
 
+def _init_recsec_worker(dbname, index_dir=INDEX_DIR, mmap=False, cache=None):
+    """
+    Pool initializer, open a connection, miniSEED reader and figure for
+    this worker process, closed when the worker exits.
+    """
+    global _worker_state
+    conn = dbapi2.connect(dbname)
+    reader = MSEEDReader(index_dir, mmap=mmap)
+    fig = Figure(figsize=(16.5, 12.75))
+    FigureCanvasAgg(fig)
+    _worker_state = (dbname, conn, reader, fig, cache)
+    Finalize(reader, reader.close, exitpriority=10)
+    Finalize(conn, conn.close, exitpriority=10)
+
+
+def _recsec_worker(job):
+    """
+    Save the record section of one orid in a worker process
+
+    Returns : tuple of (orid, str of filename or None, str of error or None)
+    """
+    orid, filename, kwargs = job
+    dbname, conn, reader, fig, cache = _worker_state
+    try:
+        filename = _recsec(conn, reader, dbname, orid, filename, fig=fig,
+                           cache=cache, **kwargs)
+    except Exception as e:
+        return orid, None, "{0}: {1}".format(e.__class__.__name__, e)
+    finally:
+        # Don't hold files open (or a stale index of a growing day file)
+        # between orids, the indexes stay in the on-disk cache
+        reader.close()
+    return orid, filename, None
+
+
+def dbrecsec_parallel(dbname, orids, path=None, nprocs=None, index_dir=INDEX_DIR,
+                      mmap=False, cache=None, progress=100, **kwargs):
+    """
+    Save record section bitmaps for many orids across a pool of processes
+
+    Each worker process holds one database connection, miniSEED reader
+    and figure, which is cleared and redrawn for each orid. The reader's
+    files are closed after each orid.
+
+    Inputs
+    ------
+    dbname    : str of Antelope database
+    orids     : sequence of orids
+    path      : str of directory to save files in (current directory)
+    nprocs    : int of number of worker processes (number of CPUs)
+    index_dir : str of miniSEED index cache directory (INDEX_DIR)
+    mmap      : bool of whether to memory-map waveform files (False)
+    cache     : nsl.common.cache.LRUFileCache of preprocessed windows (None)
+    progress  : int of how many orids between progress log messages
+    **kwargs
+        - 'distance', 'reduction_velocity', 'workers' as for dbrecsec
+
+    Returns
+    -------
+    files    : list of str of files written
+    failures : dict of {orid: str of error message}
+
+    """
+    orids = list(orids)
+    total = len(orids)
+    files = []
+    failures = {}
+    jobs = ((orid, os.path.join(path or '', "waveforms_{0}.png".format(orid)), kwargs)
+            for orid in orids)
+    pool = Pool(nprocs, _init_recsec_worker, (dbname, index_dir, mmap, cache))
+    try:
+        results = pool.imap_unordered(_recsec_worker, jobs)
+        for n, (orid, filename, error) in enumerate(results, 1):
+            if error is not None:
+                failures[orid] = error
+                LOG.error("orid {0} failed: {1}".format(orid, error))
+            elif filename is None:
+                LOG.info("No traces in stream for {0} {1}".format(dbname, orid))
+            else:
+                files.append(filename)
+            if n % progress == 0 or n == total:
+                LOG.info("Plotted {0}/{1} origins, {2} failed".format(
+                    n, total, len(failures)))
+    finally:
+        pool.close()
+        pool.join()
+    return files, failures
+
+
+usage = """dbplot_recsec
+
+USAGE: dbplot_recsec [-t <nthreads>] [-c <cachedir>] [-d] [-v <km/s>] <database> <orid> [<filename>]
+       dbplot_recsec [-j <nprocs>] [-o <dir>] [-t <nthreads>] [-c <cachedir>] [-d] [-v <km/s>] <database> <orid>[,<orid>...]
+    options:
+        -j <nprocs>   -> plot all orids using <nprocs> processes
+        -o <dir>      -> directory to write files to (batch mode)
+        -t <nthreads> -> read waveforms with <nthreads> threads
+        -c <cachedir> -> cache filtered waveform windows in <cachedir>
+        -d            -> place traces by epicentral distance
+        -v <km/s>     -> distance mode with times reduced by <km/s>
+"""
+
 def main(args):
     """
     Run dbrecsec from the command line
-    (params same as dbrecsec function)
+    (params same as dbrecsec function, or a batch of orids)
     """
-    args = args[1:]
+    try:
+        opts, args = getopt.getopt(args[1:], 'hj:o:t:c:dv:', ['help'])
+    except getopt.GetoptError:
+        print(usage)
+        return 1
+    opts = dict(opts)
+    if '-h' in opts or '--help' in opts or len(args) < 2:
+        print(usage)
+        return 0
     LOG = logging.customLogger(__name__, ['stderr'])
+    kw = {'cache': LRUFileCache(opts['-c']) if '-c' in opts else None,
+          'distance': '-d' in opts,
+          'reduction_velocity': float(opts['-v']) if '-v' in opts else None,
+          'workers': int(opts['-t']) if '-t' in opts else None}
+    if '-j' in opts or '-o' in opts or ',' in args[1]:
+        nprocs = int(opts['-j']) if '-j' in opts else None
+        try:
+            files, failures = dbrecsec_parallel(args[0], args[1].split(','),
+                path=opts.get('-o'), nprocs=nprocs, **kw)
+        except Exception as e:
+            LOG.exception(e)
+            return 1
+        return int(bool(failures))
     try:
-        fn = dbrecsec(*args)
+        fn = dbrecsec(*args, **kw)
     except Exception as e:
         LOG.exception(e)
         return 1
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+nsl.common.cache
+
+Size-bounded on-disk cache with least-recently-used eviction
+
+Each entry is one file in the cache directory, named by a hash of its
+key. The file modification time is the last use, so the cache can be
+shared by several processes using the same directory. When the cache
+goes over its size, old entries are removed down to a low-water mark,
+so the directory is only scanned now and then.
+
+Classes
+-------
+LRUFileCache(directory, max_bytes) : cache of str/bytes values by key
+
+"""
+import hashlib
+import os
+import tempfile
+
+
+class LRUFileCache(object):
+    """
+    On-disk cache of bytes with LRU eviction
+
+    Keys are any objects with a stable repr (tuples of str/int/float).
+
+    Attributes
+    ----------
+    directory : str of directory to keep cache files in
+    max_bytes : int of total size of cache files to keep
+    low_water : float of fraction of max_bytes to evict down to (0.9)
+
+    Methods
+    -------
+    get : Return cached value of a key, or a default
+    put : Store value of a key, evicting old entries
+    clear : Remove all entries
+
+    """
+    suffix = '.cache'
+    low_water = 0.9
+
+    def __init__(self, directory, max_bytes=100 * 2**20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size = None  # running total, computed on first eviction check
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # Another process could have made it first
+                if not os.path.isdir(directory):
+                    raise
+
+    def __getstate__(self):
+        """Don't pickle the running size, other processes share the dir"""
+        state = self.__dict__.copy()
+        state['_size'] = None
+        return state
+
+    def _path(self, key):
+        name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, name + self.suffix)
+
+    def _entries(self):
+        """Return list of (mtime, size, path) of cache files"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def get(self, key, default=None):
+        """
+        Return cached value of a key, or default if not in cache
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = f.read()
+        except (IOError, OSError):
+            return default
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass  # e.g. read-only cache, still a hit
+        return value
+
+    def put(self, key, value):
+        """
+        Store value of a key, evicting least recently used entries
+        if the cache is over max_bytes
+        """
+        path = self._path(key)
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        fd, tmpname = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(value)
+            os.rename(tmpname, path)
+        except Exception:
+            try:
+                os.remove(tmpname)
+            except OSError:
+                pass
+            raise
+        if self._size is not None:
+            self._size += len(value) - replaced
+        if self._size is None or self._size > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        entries = self._entries()
+        self._size = sum(e[1] for e in entries)
+        if self._size <= self.max_bytes:
+            return
+        target = self.max_bytes * self.low_water
+        for mtime, size, path in sorted(entries):
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
+
+    def clear(self):
+        """
+        Remove all entries from the cache
+        """
+        for mtime, size, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._size = 0
@@ -15,6 +15,13 @@ Functions
 ---------
 get_yaml : yaml from file handle or string content
 get_json : json from file handle or string content
+freeze   : read-only copy of nested dicts/lists
+
+
+Classes
+-------
+FrozenDict  : dict which can't be changed
+ConfigCache : parsed config files by path, reloaded when they change
 
 
 Main
@@ -23,7 +30,14 @@ get_config(filename, kind=None) : read in a file to dict
     filename : str of filename
     kind : specify type, uses extension if None
 
+cached_config(filename, kind=None) : read-only contents of a file,
+    parsed once per process and again only when the file changes
+
 """
+import os
+import threading
+import time
+
 
 def get_yaml(fh):
     """YAML to object with input type detection"""
@@ -43,6 +57,192 @@ def get_json(fh):
         return json.loads(fh)
 
 
+def _kind(filename, kind=None):
+    """Return 'YAML', 'JSON' or 'PF' of a file, from the extension if no kind"""
+    if filename.endswith('.yml') or kind=='YAML':
+        return 'YAML'
+    elif filename.endswith('.json') or kind=='JSON':
+        return 'JSON'
+    elif filename.endswith('.pf') or kind=='PF':
+        return 'PF'
+    raise NotImplementedError("No support for format: {0} type={1}".format(filename, kind))
+
+
+def read_config(filename, kind=None):
+    """Return the parsed contents of a config file (uncached)"""
+    kind = _kind(filename, kind)
+    if kind == 'PF':
+        from nsl.antelope.pf import get_pf
+        return get_pf(filename)
+    func = get_yaml if kind == 'YAML' else get_json
+    with open(filename) as f:
+        return func(f)
+
+
+class FrozenDict(dict):
+    """
+    Read-only dict
+
+    Any method which would change it raises TypeError. Use dict(d), or
+    thaw() for nested contents, to get a copy which can be changed.
+    """
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("{0} is read-only".format(self.__class__.__name__))
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
+
+    def thaw(self):
+        """Return a plain dict (of plain lists/dicts) copy"""
+        return thaw(self)
+
+
+def freeze(obj):
+    """
+    Return read-only copy of nested dicts and lists (as FrozenDict, tuple)
+    """
+    if isinstance(obj, FrozenDict):
+        return obj
+    if isinstance(obj, dict):
+        return FrozenDict((k, freeze(v)) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return tuple(freeze(v) for v in obj)
+    return obj
+
+
+def thaw(obj):
+    """Return a changeable copy of frozen contents (dicts and lists)"""
+    if isinstance(obj, dict):
+        return dict((k, thaw(v)) for k, v in obj.items())
+    if isinstance(obj, tuple):
+        return [thaw(v) for v in obj]
+    return obj
+
+
+def _stamp(filename, kind=None):
+    """
+    Return (mtime, size) of a file, None if it can't be found. A pf name
+    is stamped by all of its files on PFPATH.
+    """
+    if kind == 'PF' and not os.path.isfile(filename):
+        from nsl.antelope.pf import pf_stamps
+        return pf_stamps(filename)
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return (st.st_mtime, st.st_size)
+
+
+class ConfigCache(object):
+    """
+    Process-wide cache of parsed config files
+
+    Files are parsed once and kept as read-only (frozen) contents with
+    the mtime and size of the file. Each 'get' is then one os.stat, and
+    the file is parsed again only if it has changed. A pf name is checked
+    by its files on PFPATH. Names which can't be found are kept until
+    cleared.
+
+    Methods
+    -------
+    get(filename, kind=None) : frozen contents of a file
+    poll() : reload changed files, notify watchers
+    watch(callback, interval=None) : call callback(filename, contents) on
+        changes, polling every 'interval' seconds in a thread if given
+    clear() : forget all files
+
+    """
+    def __init__(self):
+        self._entries = {}  # {(filename, kind): (stamp, contents)}
+        self._lock = threading.Lock()
+        self._watchers = []
+        self._poller = None
+
+    def get(self, filename, kind=None):
+        """
+        Return frozen contents of a config file, parsing only if changed
+        """
+        key = (os.path.abspath(filename) if os.path.exists(filename) else filename,
+               _kind(filename, kind))
+        stamp = _stamp(*key)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and (stamp is None or entry[0] == stamp):
+            return entry[1]
+        contents = freeze(read_config(key[0], key[1]))
+        with self._lock:
+            self._entries[key] = (stamp, contents)
+        if entry is not None:
+            self._notify(key[0], contents)
+        return contents
+
+    def poll(self):
+        """
+        Reload cached files which changed, returning list of their names
+        """
+        with self._lock:
+            entries = list(self._entries.items())
+        changed = []
+        for (filename, kind), (stamp, contents) in entries:
+            if stamp is not None and _stamp(filename, kind) != stamp:
+                try:
+                    self.get(filename, kind)
+                except Exception:
+                    continue  # e.g. being rewritten, try again next poll
+                changed.append(filename)
+        return changed
+
+    def _notify(self, filename, contents):
+        for callback in list(self._watchers):
+            callback(filename, contents)
+
+    def watch(self, callback, interval=None):
+        """
+        Call callback(filename, contents) when a cached file is reloaded
+
+        With 'interval' (seconds), a daemon thread polls the files so
+        changes are picked up without waiting for the next 'get'.
+        """
+        self._watchers.append(callback)
+        if interval and self._poller is None:
+            def run():
+                while True:
+                    time.sleep(interval)
+                    self.poll()
+            self._poller = threading.Thread(target=run, name="config poller")
+            self._poller.daemon = True
+            self._poller.start()
+
+    def unwatch(self, callback):
+        """Stop calling a callback"""
+        self._watchers.remove(callback)
+
+    def clear(self):
+        """Forget all cached files"""
+        with self._lock:
+            self._entries.clear()
+
+
+CACHE = ConfigCache()  # for the whole process
+
+
+def cached_config(filename, kind=None):
+    """
+    Return read-only contents of a config file from the process cache
+    """
+    return CACHE.get(filename, kind)
+
+
 class Configuration(dict):
     """
     Preliminary dict class to hold config info
@@ -61,23 +261,11 @@ class Configuration(dict):
     def from_file(cls, filename, kind=None):
         """
         Configuration from a string filename
+
+        The file is parsed through the process cache (see ConfigCache), so
+        nested values are read-only and shared between calls.
         """
-        func = None
-        
-        if filename.endswith('.yml') or kind=='YAML':
-            func = get_yaml
-        elif filename.endswith('.json') or kind=='JSON':
-            func = get_json
-        elif filename.endswith('.pf') or kind=='PF':
-            from nsl.antelope.pf import get_pf
-            c = get_pf(filename)
-        else:
-            raise NotImplementedError("No support for format: {0} type={1}".format(filename, kind))
-
-        if func:
-            with open(filename) as f:
-                c = func(f)
-            
+        c = cached_config(filename, kind)
         try:
             config =  cls(**c)
         except:
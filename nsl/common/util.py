@@ -5,6 +5,10 @@ util.py
 Utilities for the Network Operations python package
 
 """
+import json
+import os
+
+
 def azimuth2compass(azimuth):
     """
     Return 1 of 8 compass directions from an azimuth in degrees from N
@@ -66,3 +70,20 @@ def rget(dict_, *keys):
         except AttributeError:
             return None
     return dict_
+
+
+def save_json(obj, filename, **kwargs):
+    """
+    Write an object to a JSON file, replacing the old file in one step
+
+    Inputs
+    ------
+    obj      : JSON serializable object (e.g. a state dict)
+    filename : str of file to write
+    **kwargs : passed to json.dump (e.g. indent, sort_keys)
+
+    """
+    tmpname = filename + '.tmp'
+    with open(tmpname, 'w') as f:
+        json.dump(obj, f, **kwargs)
+    os.rename(tmpname, filename)
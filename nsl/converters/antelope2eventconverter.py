@@ -18,14 +18,17 @@ Classes
 AntelopeToEventConverter(database, perm, *args, **kwargs)
 
 """
+from hashlib import sha1
 from numpy import array
+from obspy.core.utcdatetime import UTCDateTime
 from obspy.core.util import gps2DistAzimuth
 from curds2.dbapi2 import connect
-from curds2.rows import OrderedDictRow, NamedTupleRow
+from curds2.rows import NamedTupleRow
+from nsl.antelope.rows import CompactRow
 from nsl.common.util import azimuth2compass
 from nsl.obspy.util import add_quality_params_from_data
 from nsl.converters.css2eventconverter import CSSToEventConverter
-from nsl.antelope.pf import get_pf
+from nsl.common.config import cached_config
 
 
 class AntelopeToEventConverter(CSSToEventConverter):
@@ -41,6 +44,9 @@ class AntelopeToEventConverter(CSSToEventConverter):
 
     Methods
     -------
+    get_orids      : return list of ORIDs in a time range from db
+    get_changed_orids : return ORIDs with rows changed since an lddate
+    get_source_digest : return hash of the db rows used to build an Event
     get_origins    : return list of Origins from db
     get_magnitudes : return list of Magnitudes from db
     get_phases     : return lists of Pick/Arrivals from db
@@ -63,8 +69,11 @@ class AntelopeToEventConverter(CSSToEventConverter):
 
     @classmethod
     def load_pf(cls, pfname='db2quakeml'):
+        """
+        Load settings from a pf, parsed once per process (until it changes)
+        """
         try:
-            pf = get_pf(pfname)
+            pf = cached_config(pfname, kind='PF')
         except Exception:
             pf = {}
         finally:
@@ -97,7 +106,7 @@ class AntelopeToEventConverter(CSSToEventConverter):
         self.load_pf(_pf)
         
         super(AntelopeToEventConverter, self).__init__(**kwargs)
-        self.connection = connect(database, perm, row_factory=OrderedDictRow)
+        self.connection = connect(database, perm, row_factory=CompactRow)
         self.connection.CONVERT_NULL = True
     
     def __enter__(self):
@@ -151,7 +160,7 @@ class AntelopeToEventConverter(CSSToEventConverter):
         if database is None:
             database = self.place_db
         try:
-            curs = connect(database).cursor(row_factory=OrderedDictRow)
+            curs = connect(database).cursor(row_factory=CompactRow)
             nrecs = curs.execute.lookup(table='places')
             stats = array([gps2DistAzimuth(latitude, longitude, r['lat'], r['lon']) for r in curs])
             ind = stats.argmin(0)[0]
@@ -167,6 +176,119 @@ class AntelopeToEventConverter(CSSToEventConverter):
         except:
             return None
 
+    def get_orids(self, time_start=None, time_end=None):
+        """
+        Returns ORIDs of origins in a time range
+
+        Inputs
+        ------
+        time_start : epoch float or str of a time readable by UTCDateTime
+        time_end   : epoch float or str of a time readable by UTCDateTime
+
+        Returns
+        -------
+        list of int of ORID, sorted by origin time
+
+        """
+        cmd = ['dbopen origin']
+        if time_start is not None:
+            cmd.append('dbsubset time >= {0!r}'.format(UTCDateTime(time_start).timestamp))
+        if time_end is not None:
+            cmd.append('dbsubset time < {0!r}'.format(UTCDateTime(time_end).timestamp))
+        cmd.append('dbsort time')
+        curs = self.connection.cursor()
+        rec = curs.execute('process', [cmd] )
+        return [db['orid'] for db in curs]
+
+    def get_changed_orids(self, table, lddate=None, seen=()):
+        """
+        Returns ORIDs with rows in a table loaded at or after a given lddate
+        
+        Inputs
+        ------
+        table  : str of table name with an 'orid' field, or 'arrival'
+        lddate : float of epoch time of last change seen (None -> all rows)
+        seen   : sequence of int of ORIDs already returned for rows at
+                 exactly 'lddate' (the 'ties' of the last call)
+
+        Returns
+        -------
+        orids  : set of int of ORID (no null ORIDs)
+        lddate : float of latest lddate seen (input lddate if no rows)
+        ties   : set of int of ORIDs with rows at the returned lddate
+
+        Notes
+        -----
+        Rows in 'arrival' are joined to 'assoc' to find their orids. Rows
+        at exactly 'lddate' are looked at again, so changes made in the
+        same second as the last run are not missed, but orids in 'seen'
+        are not returned again for them.
+
+        """
+        cmd = ['dbopen {0}'.format(table)]
+        if lddate is not None:
+            cmd.append('dbsubset lddate >= {0!r}'.format(lddate))
+        lddate_field = 'lddate'
+        if table == 'arrival':
+            cmd.append('dbjoin assoc')
+            lddate_field = 'arrival.lddate'
+        curs = self.connection.cursor()
+        rec = curs.execute('process', [cmd] )
+        seen = set(seen)
+        orids = set()
+        ties = set()
+        latest = lddate
+        for db in curs:
+            orid, t = db['orid'], db[lddate_field]
+            if latest is None or t > latest:
+                latest = t
+                ties = set()
+            # null (None with CONVERT_NULL, or -1) orids have nothing to send
+            if orid is None or orid < 0:
+                continue
+            if t == lddate and orid in seen:
+                continue
+            orids.add(orid)
+            if t == latest:
+                ties.add(orid)
+        if latest == lddate:
+            ties |= seen
+        return orids, latest, ties
+
+    def get_source_digest(self, orid, phases=False, focals=False):
+        """
+        Returns a hash of the database rows an Event for an ORID is built from
+
+        Inputs
+        ------
+        orid   : int of ORID
+        phases : bool of whether to include assoc/arrival rows (False)
+        focals : bool of whether to include fplane rows (False)
+
+        Returns : str of hex digest, changes if any source row or the pf
+                  settings used by the converter change
+
+        """
+        substr = 'dbsubset orid=={0}'.format(orid)
+        cmds = [['dbopen origin', 'dbjoin -o origerr', substr],
+                ['dbopen netmag', substr]]
+        if phases:
+            cmds.append(['dbopen assoc', substr, 'dbjoin arrival',
+                         'dbjoin -o snetsta', 'dbjoin -o schanloc sta chan'])
+        if focals:
+            cmds.append(['dbopen fplane', substr])
+        h = sha1()
+        settings = (self.agency, self.auth_id, self.place_db, sorted(self.emap.items()))
+        h.update(repr(settings).encode('utf-8'))
+        for cmd in cmds:
+            curs = self.connection.cursor()
+            rec = curs.execute('process', [cmd] )
+            h.update(repr(rec).encode('utf-8'))
+            for db in curs:
+                # every field, including repeats from joins (e.g. lddate)
+                h.update(repr(tuple(db)).encode('utf-8'))
+        return h.hexdigest()
+
     def get_focalmechs(self, orid=None):
         """
         Returns FocalMechanism instances of an ORID
@@ -303,7 +425,7 @@ class AntelopeToEventConverter(CSSToEventConverter):
             # Add other data objects
             if phases:
                 self.event.picks, origin.arrivals = self.get_phases(orid)
-                add_quality_params_from_data(origin)
+                add_quality_params_from_data(origin, picks=self.event.picks)
         if focals:
             focalmechs = self.get_focalmechs(orid)
             self.event.focal_mechanisms = focalmechs
@@ -31,6 +31,21 @@ from obspy.core.event import (Catalog, Event, Origin, CreationInfo, Magnitude,
 
 CSS_NAMESPACE = 'http://www.seismo.unr.edu/schema/css3.0'
 
+# Standard CSS3.0 etype -> QuakeML eventType
+CSS_EVENT_TYPES = {
+    'qb' : "quarry blast",
+    'eq' : "earthquake",
+    'me' : "meteorite",
+    'ex' : "explosion",
+    'o'  : "other event",
+    'l'  : "earthquake",
+    'r'  : "earthquake",
+    't'  : "earthquake",
+    'f'  : "earthquake",
+    }
+
+_event_type_resolvers = {}  # {sorted etype_map items: resolver}
+
 
 def _utc(timestamp):
     """Returns the UTCDateTime"""
@@ -87,6 +102,45 @@ def _get_NE_on_ellipse(A, B, strike):
     return n, e
 
 
+def _event_type_resolver(etype_map=None):
+    """
+    Return a function mapping an etype to an eventType for an etype_map
+
+    The merged map is built once per etype_map, and each etype is only
+    looked up once, after which the result is remembered.
+    """
+    key = tuple(sorted(etype_map.items())) if etype_map else ()
+    try:
+        return _event_type_resolvers[key]
+    except KeyError:
+        pass
+    event_type_map = dict(CSS_EVENT_TYPES)
+    event_type_map.update(key)
+    items = list(event_type_map.items())
+    memo = {}
+
+    def resolve(etype):
+        try:
+            return memo[etype]
+        except KeyError:
+            pass
+        # Try to find a direct match, then check for stuff like 'LF'
+        e = etype.lower()
+        if e in event_type_map:
+            event_type = event_type_map[e]
+        else:
+            event_type = None
+            for k, v in items:
+                if k in e:
+                    event_type = v
+                    break
+        memo[etype] = event_type
+        return event_type
+
+    _event_type_resolvers[key] = resolve
+    return resolve
+
+
 class CSSToEventConverter(object):
     """
     Converter to build an ObsPy Event instance from CSS3.0 database
@@ -127,28 +181,12 @@ class CSSToEventConverter(object):
         etype : str of a valid etype
         etype_map: dict of {etype: eventType} added to standard css3.0 one
 
+        Notes
+        -----
+        Results are memoized per etype_map, see CSS_EVENT_TYPES
+
         """
-        event_type_map = {
-            'qb' : "quarry blast",
-            'eq' : "earthquake",
-            'me' : "meteorite",
-            'ex' : "explosion",
-            'o'  : "other event",
-            'l'  : "earthquake",
-            'r'  : "earthquake",
-            't'  : "earthquake",
-            'f'  : "earthquake",
-            }
-        # Add custom flags
-        if etype_map:
-            event_type_map.update(etype_map)
-        # Try to find a direct match, then check for stuff like 'LF'
-        if etype.lower() in event_type_map:
-            return event_type_map[etype.lower()]
-        else:
-            for k,v in event_type_map.items():
-                if k in etype.lower():
-                    return v
+        return _event_type_resolver(etype_map)(etype)
     
     @classmethod
     def origin_event_type(cls, origin, emap=None):
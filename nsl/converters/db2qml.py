@@ -4,10 +4,18 @@
 # make QuakeML files suitable for submission to ANSS.
 """
 import os
+import getopt
+import hashlib
+from multiprocessing import Pool
+from multiprocessing.util import Finalize
 from obspy.core.event import (UTCDateTime, Event, CreationInfo, Magnitude,
                               ResourceIdentifier)
 from nsl.converters.db2quakemlconverter import DBToQuakemlConverter
 from nsl.converters.ichinose import mt2event
+from nsl.common.cache import LRUFileCache
+import nsl.common.logging as logging
+
+LOG = logging.customLogger(__name__)
 
 class CustomRIDFunction(object):
     """NSL custom function for making ResourceIdentifier objects"""
@@ -142,14 +150,49 @@ class Converter(DBToQuakemlConverter):
         extra_attributes = self.quakeml_anss_attrib(evid)
         self.event.extra = self.extra_anss(**extra_attributes)
 
+    def cache_key(self, product, evid=None, orid=None, delete=False,
+                  phase_data=False, focal_data=False, mt=None):
+        """
+        Return a key for the QuakeML that 'build' would make, without building
+        
+        Inputs
+        ------
+        product : str of product name
+        **kwargs : same as 'build'
 
-def db2qml(**kwargs):
-    """
-    Function to run an Event converter and produce some
-    QuakeML, returns a dict with a name and contents of
-    the file as a string.
+        Returns
+        -------
+        tuple of (evid, orid, product, str of hash of the source rows),
+        or None if the EVID can't be known before building, for a
+        delete (its creationTime has to be new every time), or if mt
+        is an open file rather than its contents
 
-    """
+        """
+        if delete:
+            return None
+        if evid is None and orid:
+            try:
+                evid = self._evid(orid)
+            except:
+                pass
+        if not evid:
+            return None
+        if mt:
+            if hasattr(mt, 'read'):
+                return None  # can't hash a file without using it up
+            settings = (self.agency, self.auth_id, self.place_db, sorted(self.emap.items()))
+            h = hashlib.sha1(repr(settings).encode('utf-8'))
+            h.update(mt if isinstance(mt, bytes) else mt.encode('utf-8'))
+            digest = h.hexdigest()
+        else:
+            digest = self.get_source_digest(orid, phases=phase_data, focals=focal_data)
+        if orid is not None:
+            orid = int(orid)
+        return (int(evid), orid, product, digest)
+
+
+def _product(kwargs):
+    """Return the product name implied by the build keyword args"""
     if   'delete' in kwargs and kwargs['delete']:
         product = "delete"
     elif 'mt' in kwargs and kwargs['mt'] is not None:
@@ -160,13 +203,65 @@ def db2qml(**kwargs):
         product = "phase"
     else:
         product = "origin"
-    
-    database = kwargs.pop('database')
-    with Converter(database) as eb:
-        eb.build(**kwargs)
-        qml_text = eb.quakeml_str()
-        qml_file = eb.quakeml_filename(product)
-    return {'name': qml_file, 'contents': qml_text}
+    return product
+
+
+def db2qml(converter=None, cache=None, **kwargs):
+    """
+    Function to run an Event converter and produce some
+    QuakeML, returns a dict with a name and contents of
+    the file as a string.
+
+    Inputs
+    ------
+    converter : open Converter instance to reuse (None)
+        If None, a Converter is opened on kwargs['database'] and
+        closed again when done.
+    cache : nsl.common.cache.LRUFileCache of QuakeML (None)
+        If given, QuakeML for unchanged source rows is taken from
+        the cache instead of being built again.
+    **kwargs
+        - passed to Converter.build()
+
+    Returns
+    -------
+    dict of 'name' : str of filename
+            'contents' : str of QuakeML
+            'cached' : bool of whether contents came from the cache
+
+    """
+    product = _product(kwargs)
+    if converter is None:
+        database = kwargs.pop('database')
+        with Converter(database) as eb:
+            return db2qml(converter=eb, cache=cache, **kwargs)
+    key = None
+    if cache is not None:
+        if hasattr(kwargs.get('mt'), 'read'):
+            # Read once, so the same contents are hashed and built
+            kwargs['mt'] = kwargs['mt'].read()
+        key = converter.cache_key(product, **kwargs)
+    if key is not None:
+        qml_text = cache.get(key)
+        if qml_text is not None:
+            qml_file = converter.quakeml_filename(product, evid=key[0])
+            return {'name': qml_file, 'contents': qml_text, 'cached': True}
+    # Start from a blank Event so nothing leaks from a previous build
+    converter.event = Event()
+    converter.build(**kwargs)
+    qml_text = converter.quakeml_str()
+    qml_file = converter.quakeml_filename(product)
+    if key is not None:
+        cache.put(key, qml_text)
+    return {'name': qml_file, 'contents': qml_text, 'cached': False}
+
+def _unchanged(qml_file, contents):
+    """Return True if a file exists and has the given contents"""
+    try:
+        with open(qml_file, 'rb') as qf:
+            return qf.read() == contents
+    except IOError:
+        return False
 
 def write_quakeml(path=None, **kwargs):
     """
@@ -179,8 +274,11 @@ def write_quakeml(path=None, **kwargs):
     ------
     path : str of directory to save file in
     **kwargs
-        - passed to EventBuilder.build()
+        - passed to db2qml()
         - depend on implementation
+
+    Returns : list of str of the file written, empty if the QuakeML
+              came from the cache and the file already had it.
     """
     qml = db2qml(**kwargs)
     if path:
@@ -188,6 +286,9 @@ def write_quakeml(path=None, **kwargs):
     else:
         qml_file = qml['name']
     
+    if qml.get('cached') and _unchanged(qml_file, qml['contents']):
+        return []
+    
     try: 
         with open(qml_file,'w') as qf:
             qf.write(qml['contents'])
@@ -196,39 +297,177 @@ def write_quakeml(path=None, **kwargs):
     
     return [ qml_file ]
 
+#
+# Parallel export
+#
+_worker_converter = None  # Converter held by each export worker process
+
+
+def _init_export_worker(database):
+    """
+    Pool initializer, open a read-only Converter for this worker process,
+    closed when the worker exits.
+    """
+    global _worker_converter
+    _worker_converter = Converter(database, perm='r')
+    Finalize(_worker_converter, _worker_converter.__exit__,
+             args=(None, None, None), exitpriority=10)
+
+
+def _export_worker(job):
+    """
+    Write QuakeML for one orid in a worker process
+
+    Returns : tuple of (orid, list of files written, str of error or None)
+    """
+    orid, path, kwargs = job
+    try:
+        files = write_quakeml(path, converter=_worker_converter, orid=orid, **kwargs)
+    except Exception as e:
+        return orid, [], "{0}: {1}".format(e.__class__.__name__, e)
+    if not all(files):
+        return orid, [], "IOError: could not write file in {0}".format(path)
+    return orid, files, None
+
+
+def write_quakeml_parallel(database, orids=None, time_start=None,
+                           time_end=None, path=None, nprocs=None,
+                           failure_log=None, progress=100, **kwargs):
+    """
+    Write QuakeML files for many origins across a pool of processes
+    
+    Each worker process holds its own read-only Converter connection
+    and writes files through write_quakeml.
+
+    Inputs
+    ------
+    database    : str name of database
+    orids       : sequence of int of ORID (None -> use time range)
+    time_start  : start of origin time range, used if no orids
+    time_end    : end of origin time range, used if no orids
+    path        : str of directory to save files in
+    nprocs      : int of number of worker processes (number of CPUs)
+    failure_log : str of filename to write failed orids and errors to
+    progress    : int of how many events between progress log messages
+    **kwargs
+        - passed to Converter.build() for every orid
+
+    Returns
+    -------
+    files    : list of str of files written
+    failures : dict of {orid: str of error message}
+
+    """
+    if orids is None:
+        with Converter(database) as eb:
+            orids = eb.get_orids(time_start, time_end)
+    orids = list(orids)
+    total = len(orids)
+    files = []
+    failures = {}
+    LOG.info("Exporting {0} origins from {1}".format(total, database))
+    jobs = ((orid, path, kwargs) for orid in orids)
+    pool = Pool(nprocs, _init_export_worker, (database,))
+    try:
+        results = pool.imap_unordered(_export_worker, jobs)
+        for n, (orid, written, error) in enumerate(results, 1):
+            if error is None:
+                files.extend(written)
+            else:
+                failures[orid] = error
+                LOG.error("orid {0} failed: {1}".format(orid, error))
+            if n % progress == 0 or n == total:
+                LOG.info("Exported {0}/{1} origins, {2} failed".format(
+                    n, total, len(failures)))
+    finally:
+        pool.close()
+        pool.join()
+    if failure_log and failures:
+        with open(failure_log, 'w') as f:
+            for orid in sorted(failures):
+                f.write("{0}\t{1}\n".format(orid, failures[orid]))
+    return files, failures
+
 #
 # MAIN
 #
 usage = """db2qml.py
 
 USAGE: ./db2qml.py <database> <orid> [<products>]
+       ./db2qml.py -j <nprocs> [-o <dir>] [-l <logfile>] <database> <orid>[,<orid>...] [<products>]
+       ./db2qml.py -j <nprocs> [-o <dir>] [-l <logfile>] -s <start> -e <end> <database> [<products>]
+       ./db2qml.py -i <statefile> [-j <nprocs>] [-o <dir>] <database> [<products>]
     where product is:
         'delete' -> delete message for orid's entire event
         'phases' -> origin with phases for orid
         'focalmech' -> focalmechs for orid
+    options:
+        -j <nprocs>  -> write files for all orids using <nprocs> processes
+        -o <dir>     -> directory to write files to (parallel mode)
+        -l <logfile> -> file to record failed orids in (parallel mode)
+        -s <start>   -> start of origin time range (parallel mode)
+        -e <end>     -> end of origin time range (parallel mode)
+        -i <statefile> -> only write files for orids changed since the
+                          last run, keeping track in <statefile>
+        -c <cachedir> -> cache QuakeML in <cachedir>, don't rewrite
+                         files whose source rows are unchanged
 """
 
 def main(cli_args):   
     """
     Run a QuakeMLifier as a script
     """
-    if len(cli_args) < 3 or '-h' in cli_args or '--help' in cli_args \
-      or 'help' in cli_args[1]:
+    try:
+        opts, args = getopt.getopt(cli_args[1:], 'hj:o:l:s:e:i:c:', ['help'])
+    except getopt.GetoptError:
+        print(usage)
+        return 1
+    opts = dict(opts)
+    time_range = '-s' in opts or '-e' in opts
+    no_ids = time_range or '-i' in opts
+    if '-h' in opts or '--help' in opts or not args or \
+      (len(args) < 2 and not no_ids) or 'help' in args[0] or \
+      (time_range and '-j' not in opts):
         print(usage)
         return 0
     
-    _db = cli_args[1]
-    _id = cli_args[2]
+    _db = args[0]
+    if no_ids:
+        _ids = None
+        products = args[1:]
+    else:
+        _ids = args[1]
+        products = args[2:]
 
     kw = {}
-    if len(cli_args) >= 4:
-        args = cli_args[3:]
-        if 'delete' in args:
+    if products:
+        if 'delete' in products:
             kw['delete'] = True
-        if 'focalmech' in args:
+        if 'focalmech' in products:
             kw['focal_data'] = True
-        if 'phases' in args:
+        if 'phases' in products:
             kw['phase_data'] = True
+    if '-c' in opts:
+        kw['cache'] = LRUFileCache(opts['-c'])
     
-    print(db2qml(database=_db, orid=_id, **kw)['contents'])
+    if '-i' in opts:
+        from nsl.converters.incremental import export_incremental
+        logging.customLogger('nsl.converters.incremental', ['stderr'])
+        logging.customLogger(__name__, ['stderr'])
+        nprocs = int(opts['-j']) if '-j' in opts else None
+        files, failures = export_incremental(_db, opts['-i'],
+            path=opts.get('-o'), nprocs=nprocs, **kw)
+        return int(bool(failures))
+
+    if '-j' in opts:
+        LOG = logging.customLogger(__name__, ['stderr'])
+        if _ids is not None:
+            _ids = [int(i) for i in _ids.split(',')]
+        files, failures = write_quakeml_parallel(_db, orids=_ids,
+            time_start=opts.get('-s'), time_end=opts.get('-e'),
+            path=opts.get('-o'), nprocs=int(opts['-j']),
+            failure_log=opts.get('-l'), **kw)
+        return int(bool(failures))
+
+    print(db2qml(database=_db, orid=_ids, **kw)['contents'])
     return 0
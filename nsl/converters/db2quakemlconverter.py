@@ -90,10 +90,11 @@ class DBToQuakemlConverter(AntelopeToEventConverter):
         Build up an Event using various parameters
     quakeml_str(): Return QuakeML string of the current Event object
     quakeml_anss_attrib(self, evid=None): Construct dict of ANSS attributes
-    quakeml_filename(self, product): Try to construct a meaningful XML filename
+    quakeml_filename(self, product, evid=None): Try to construct a meaningful XML filename
 
     """
     rid_factory = rid_function
+    pretty_print = True  # False for compact QuakeML (faster, smaller files)
 
     def quakeml_anss_attrib(self, evid=None):
         """
@@ -116,8 +117,15 @@ class DBToQuakemlConverter(AntelopeToEventConverter):
             anss_id = '00000000'
         return {'datasource' : agency_code, 'dataid' : agency_code + anss_id, 'eventsource' : agency_code, 'eventid' : anss_id}
 
-    def quakeml_filename(self, product):
-        return self.event.extra['dataid']['value'] + '_' + product + '.xml'
+    def quakeml_filename(self, product, evid=None):
+        """
+        Return filename for a product of the current Event, or of an EVID
+        """
+        if evid is None:
+            dataid = self.event.extra['dataid']['value']
+        else:
+            dataid = self.quakeml_anss_attrib(evid)['dataid']
+        return dataid + '_' + product + '.xml'
 
     def extra_anss(self, **kwargs):
         """
@@ -194,7 +202,7 @@ class DBToQuakemlConverter(AntelopeToEventConverter):
         Returns : str of QuakeML file contents
 
         """
-        return Pickler(nsmap=cls.nsmap).dumps(c)
+        return Pickler(nsmap=cls.nsmap, pretty_print=cls.pretty_print).dumps(c)
 
     def quakeml_str(self):
         """
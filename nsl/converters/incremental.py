@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+incremental.py
+
+    Nevada Seismological Laboratory
+
+Incremental QuakeML export driven by lddate change tracking.
+
+The maximum 'lddate' seen in each tracked table is stored in a small
+JSON state file, with the orids of the rows at that lddate, so they are
+not rebuilt again on the next run. Each run only rebuilds QuakeML for
+the orids which have rows loaded or modified since the last run, so the
+exporter can be run every minute against a production database.
+
+
+Classes
+=======
+ExportState : dict of table watermarks and orids to retry, saved to file
+
+
+Functions
+=========
+changed_orids(converter, state, tables) : orids changed since last run
+export_incremental(database, statefile, ...) : write QuakeML for changes
+
+"""
+import json
+import os
+
+import nsl.common.logging as logging
+from nsl.common.util import save_json
+from nsl.converters.db2qml import (Converter, write_quakeml,
+                                   write_quakeml_parallel)
+
+LOG = logging.customLogger(__name__)
+
+ORIGIN_TABLES = ('origin', 'origerr', 'netmag')
+PHASE_TABLES = ('assoc', 'arrival')
+FOCAL_TABLES = ('fplane',)
+
+
+class ExportState(dict):
+    """
+    Persistent state of an incremental export
+
+    Keys
+    ----
+    lddate : dict of {table: float of max lddate seen}
+    seen   : dict of {table: list of int of orids with rows at that lddate}
+    retry  : list of int of orids which failed and need to be redone
+
+    """
+    filename = None
+
+    def __init__(self, filename):
+        super(ExportState, self).__init__(lddate={}, seen={}, retry=[])
+        self.filename = filename
+        if os.path.exists(filename):
+            with open(filename) as f:
+                self.update(json.load(f))
+
+    def save(self):
+        """
+        Write state to file, replacing the old file in one step
+        """
+        save_json(self, self.filename, indent=1, sort_keys=True)
+
+
+def tracked_tables(phase_data=False, focal_data=False, **kwargs):
+    """
+    Return tuple of tables whose changes affect a product
+
+    Inputs are the Converter.build() keyword args for the product.
+    """
+    tables = ORIGIN_TABLES
+    if phase_data:
+        tables += PHASE_TABLES
+    if focal_data:
+        tables += FOCAL_TABLES
+    return tables
+
+
+def changed_orids(converter, state, tables=ORIGIN_TABLES):
+    """
+    Find orids with rows changed since the lddates stored in a state
+
+    Inputs
+    ------
+    converter : open AntelopeToEventConverter
+    state     : ExportState of the last run
+    tables    : sequence of str of table names to check
+
+    Returns
+    -------
+    orids  : set of int of ORID, including orids to retry
+    lddate : dict of {table: float of max lddate seen} for the next run
+    seen   : dict of {table: list of int of orids at that lddate}
+
+    """
+    orids = set(state['retry'])
+    lddate = dict(state['lddate'])
+    seen = dict(state['seen'])
+    for table in tables:
+        try:
+            changed, lddate[table], ties = converter.get_changed_orids(
+                table, lddate.get(table), seen.get(table, ()))
+        except Exception as e:
+            LOG.warning("Skipping table {0}: {1}".format(table, e))
+            continue
+        seen[table] = sorted(ties)
+        orids |= changed
+    return orids, lddate, seen
+
+
+def export_incremental(database, statefile, path=None, nprocs=None, **kwargs):
+    """
+    Write QuakeML files for orids changed since the last run
+
+    The first run (no state file) exports every origin in the database.
+
+    Inputs
+    ------
+    database  : str name of database
+    statefile : str of filename to keep the export state in
+    path      : str of directory to save files in
+    nprocs    : int of number of worker processes (None -> run serially)
+    **kwargs
+        - passed to Converter.build() for every orid
+
+    Returns
+    -------
+    files    : list of str of files written
+    failures : dict of {orid: str of error message}
+
+    Notes
+    -----
+    Orids which fail are kept in the state file and retried on the
+    next run, the lddates are always advanced.
+
+    """
+    state = ExportState(statefile)
+    tables = tracked_tables(**kwargs)
+    files = []
+    failures = {}
+    with Converter(database) as eb:
+        orids, lddate, seen = changed_orids(eb, state, tables)
+        LOG.info("{0} origins changed in {1}".format(len(orids), database))
+        if orids and nprocs is None:
+            for orid in sorted(orids):
+                try:
+                    written = write_quakeml(path, converter=eb, orid=orid,
+                                            **kwargs)
+                except Exception as e:
+                    failures[orid] = "{0}: {1}".format(e.__class__.__name__, e)
+                    LOG.error("orid {0} failed: {1}".format(orid, failures[orid]))
+                    continue
+                if all(written):
+                    files.extend(written)
+                else:
+                    failures[orid] = "IOError: could not write file in {0}".format(path)
+    if orids and nprocs is not None:
+        files, failures = write_quakeml_parallel(database, sorted(orids),
+            path=path, nprocs=nprocs, **kwargs)
+    state['lddate'] = lddate
+    state['seen'] = seen
+    state['retry'] = sorted(failures)
+    state.save()
+    return files, failures
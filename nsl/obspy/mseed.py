@@ -0,0 +1,543 @@
+# -*- coding: utf-8 -*-
+"""
+mseed.py
+-Nevada Seismological Laboratory
+
+Indexed windowed reads of miniSEED files
+
+The fixed header and blockette 1000 of every record in a file are parsed
+once into a NumPy record array (the index), which is cached on disk by
+file path and checked against the file size and modification time. A
+read of a time window then only touches the records covering it.
+
+With 'mmap', files are memory-mapped and records with integer, float,
+Steim1 or Steim2 data are decoded here, straight from the mapped file into
+one preallocated array per trace, without copying the raw bytes.
+
+Classes
+-------
+MSEEDReader : read time windows from miniSEED files, reusing open files
+
+Functions
+---------
+build_index(path) : numpy record array of the records in a file
+load_index(path, cache_dir=None) : cached index of a file
+decode_records(buf, records, out=None) : decode records into an array
+
+"""
+import hashlib
+import io
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+import numpy as np
+import obspy.core
+
+INDEX_DIR = os.path.join(tempfile.gettempdir(), 'nsl-mseed-index')
+
+INDEX_DTYPE = np.dtype([
+    ('network', 'S2'),
+    ('station', 'S5'),
+    ('location', 'S2'),
+    ('channel', 'S3'),
+    ('starttime', 'f8'),
+    ('endtime', 'f8'),
+    ('sampling_rate', 'f8'),
+    ('npts', 'i4'),
+    ('offset', 'i8'),
+    ('reclen', 'i4'),
+    ('data_offset', 'i4'),
+    ('encoding', 'u1'),
+    ('bigendian', '?'),
+    ])
+
+# Data encodings decoded by decode_records, {code: output dtype}
+INT16, INT32, FLOAT32, FLOAT64, STEIM1, STEIM2 = 1, 3, 4, 5, 10, 11
+DECODED_DTYPES = {
+    INT16: np.int32,
+    INT32: np.int32,
+    FLOAT32: np.float32,
+    FLOAT64: np.float64,
+    STEIM1: np.int32,
+    STEIM2: np.int32,
+    }
+
+# Steim difference words, {(version, nibble, dnib): (count, bits)}
+_STEIM_WORDS = {
+    (1, 1, None): (4, 8),
+    (1, 2, None): (2, 16),
+    (1, 3, None): (1, 32),
+    (2, 1, None): (4, 8),
+    (2, 2, 1): (1, 30),
+    (2, 2, 2): (2, 15),
+    (2, 2, 3): (3, 10),
+    (2, 3, 0): (5, 6),
+    (2, 3, 1): (6, 5),
+    (2, 3, 2): (7, 4),
+    }
+
+# Fixed section of data header, big-endian (SEED v2.4 ch. 8)
+_HEADER_FIELDS = [
+    ('station', 'S5', 8),
+    ('location', 'S2', 13),
+    ('channel', 'S3', 15),
+    ('network', 'S2', 18),
+    ('year', 'u2', 20),
+    ('day', 'u2', 22),
+    ('hour', 'u1', 24),
+    ('minute', 'u1', 25),
+    ('second', 'u1', 26),
+    ('fract', 'u2', 28),
+    ('npts', 'u2', 30),
+    ('rate_factor', 'i2', 32),
+    ('rate_mult', 'i2', 34),
+    ('activity', 'u1', 36),
+    ('nblockettes', 'u1', 39),
+    ('time_correction', 'i4', 40),
+    ('data_offset', 'u2', 44),
+    ('blockette_offset', 'u2', 46),
+    ]
+
+
+def _header_dtype(byteorder):
+    return np.dtype({
+        'names': [f[0] for f in _HEADER_FIELDS],
+        'formats': [byteorder + f[1] if f[1][0] in 'iu' else f[1]
+                    for f in _HEADER_FIELDS],
+        'offsets': [f[2] for f in _HEADER_FIELDS],
+        'itemsize': 48,
+        })
+
+
+def _byteorder(header):
+    """Return '>' or '<' from the year of a 48 byte header"""
+    year, = struct.unpack('>H', header[20:22])
+    if 1900 <= year <= 2100:
+        return '>'
+    return '<'
+
+
+def _blockettes(fh, offset, header, byteorder):
+    """
+    Return reclen, encoding, bigendian, microsecond offset of a record from
+    its blockettes 1000 and 1001
+    """
+    reclen = encoding = bigendian = None
+    usec = 0
+    next_, = struct.unpack(byteorder + 'H', header[46:48])
+    seen = 0
+    while next_ and seen < 32:
+        fh.seek(offset + next_)
+        b = fh.read(8)
+        if len(b) < 8:
+            break
+        btype, nxt = struct.unpack(byteorder + 'HH', b[:4])
+        if btype == 1000:
+            encoding = ord(b[4:5])
+            bigendian = ord(b[5:6]) == 1
+            reclen = 2 ** ord(b[6:7])
+        elif btype == 1001:
+            usec = struct.unpack('b', b[5:6])[0]
+        next_ = nxt
+        seen += 1
+    return reclen, encoding, bigendian, usec
+
+
+def build_index(path):
+    """
+    Return a numpy record array (INDEX_DTYPE) of the records in a file
+
+    Every record needs a blockette 1000 (as any miniSEED record should).
+    Times are epoch seconds, with the header time correction applied if
+    it hasn't been already, and blockette 1001 microseconds.
+
+    """
+    headers = []
+    rows = []
+    with open(path, 'rb') as fh:
+        offset = 0
+        while True:
+            fh.seek(offset)
+            header = fh.read(48)
+            if len(header) < 48:
+                break
+            byteorder = _byteorder(header)
+            reclen, encoding, bigendian, usec = _blockettes(fh, offset, header, byteorder)
+            if reclen is None or not 128 <= reclen <= 2**20:
+                raise ValueError("No blockette 1000 in record at {0} of {1}".format(offset, path))
+            headers.append((header, byteorder))
+            rows.append((offset, reclen, encoding, bigendian, usec))
+            offset += reclen
+    index = np.zeros(len(rows), dtype=INDEX_DTYPE)
+    if not rows:
+        return index
+    # Decode headers in one go for each byte order
+    for byteorder in ('>', '<'):
+        sel = np.array([b == byteorder for h, b in headers])
+        if not sel.any():
+            continue
+        raw = b''.join(h for (h, b), s in zip(headers, sel) if s)
+        hdr = np.frombuffer(raw, dtype=_header_dtype(byteorder))
+        days = (hdr['year'].astype('i8') - 1970).astype('M8[Y]').astype('M8[D]').astype('i8')
+        t = ((days + hdr['day'] - 1) * 86400. + hdr['hour'] * 3600. +
+             hdr['minute'] * 60. + hdr['second'] + hdr['fract'] * 1e-4)
+        # time correction not applied yet (activity flag bit 1)
+        t += np.where(hdr['activity'] & 2, 0, hdr['time_correction']) * 1e-4
+        f = hdr['rate_factor'].astype('f8')
+        m = hdr['rate_mult'].astype('f8')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rate = np.where(f > 0, np.where(m >= 0, f * np.where(m == 0, 1, m), -f / m),
+                            np.where(m > 0, -m / f, 1. / (f * m)))
+        rate[(f == 0) | ~np.isfinite(rate)] = 0.
+        index['network'][sel] = hdr['network']
+        index['station'][sel] = hdr['station']
+        index['location'][sel] = hdr['location']
+        index['channel'][sel] = hdr['channel']
+        index['starttime'][sel] = t
+        index['sampling_rate'][sel] = rate
+        index['npts'][sel] = hdr['npts']
+        index['data_offset'][sel] = hdr['data_offset']
+    offset, reclen, encoding, bigendian, usec = zip(*rows)
+    index['offset'] = offset
+    index['reclen'] = reclen
+    index['encoding'] = encoding
+    index['bigendian'] = bigendian
+    index['starttime'] += np.array(usec) * 1e-6
+    for code in ('network', 'station', 'location', 'channel'):
+        index[code] = np.char.strip(index[code])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        duration = np.where(index['sampling_rate'] > 0,
+                            (index['npts'] - 1) / index['sampling_rate'], 0.)
+    index['endtime'] = index['starttime'] + np.maximum(duration, 0.)
+    return index
+
+
+def _steim_diffs(words, version):
+    """
+    Return the differences in the data words of Steim frames
+
+    Inputs
+    ------
+    words   : array of (n frames, 16) big-endian uint32 frame words
+    version : int of Steim version (1 or 2)
+
+    """
+    w = words.astype(np.int64)
+    # 2-bit nibbles of each word from word 0 of its frame
+    shifts = 30 - 2 * np.arange(16)
+    nibbles = (w[:, :1] >> shifts) & 3
+    w = w.ravel()
+    nibbles = nibbles.ravel()
+    dnibs = (w >> 30) & 3
+    count = np.zeros(w.shape, dtype=np.int64)
+    bits = np.ones(w.shape, dtype=np.int64)
+    for (v, nibble, dnib), (k, b) in _STEIM_WORDS.items():
+        if v != version:
+            continue
+        sel = nibbles == nibble
+        if dnib is not None:
+            sel &= dnibs == dnib
+        count[sel] = k
+        bits[sel] = b
+    # k values of b bits, first one in the most significant bits
+    j = np.arange(7)
+    valid = j < count[:, None]
+    shift = np.where(valid, (count[:, None] - 1 - j) * bits[:, None], 0)
+    values = (w[:, None] >> shift) & ((1 << bits[:, None]) - 1)
+    sign = 1 << (bits[:, None] - 1)
+    values = (values ^ sign) - sign
+    return values[valid]
+
+
+def _steim_swap(words, version):
+    """
+    Return big-endian word values of little-endian Steim frames
+
+    Little-endian writers (libmseed) swap each value at its own size, so
+    1-byte differences are in stream order, 16-bit ones are swapped within
+    their half of the word, and everything else as a 32-bit word.
+
+    Inputs
+    ------
+    words   : array (nframes, 16) of frame words read as big-endian
+    version : int of Steim version (1 or 2)
+
+    """
+    w = words.astype(np.int64)
+    swapped = (((w & 0xff) << 24) | ((w & 0xff00) << 8) |
+               ((w >> 8) & 0xff00) | ((w >> 24) & 0xff))
+    halves = ((w & 0x00ff00ff) << 8) | ((w >> 8) & 0x00ff00ff)
+    shifts = 30 - 2 * np.arange(16)
+    nibbles = (swapped[:, :1] >> shifts) & 3
+    if version == 1:
+        return np.where(nibbles == 1, w, np.where(nibbles == 2, halves, swapped))
+    return np.where(nibbles == 1, w, swapped)
+
+
+def decode_records(buf, records, out=None):
+    """
+    Decode the data of records into one array
+
+    The records (rows of an index, in time order) should be from one
+    channel and have the same encoding. Nothing is copied from 'buf' but
+    the decoded samples.
+
+    Inputs
+    ------
+    buf     : buffer of the file (e.g. mmap or bytes)
+    records : index array of the records to decode
+    out     : array to decode into, of at least the total npts
+              (None -> allocate one of DECODED_DTYPES[encoding])
+
+    Returns : array of samples (view of 'out')
+
+    """
+    npts = int(records['npts'].sum())
+    encoding = int(records['encoding'][0])
+    if out is None:
+        out = np.empty(npts, dtype=DECODED_DTYPES[encoding])
+    pos = 0
+    words = None
+    try:
+        for rec in records:
+            n = int(rec['npts'])
+            start = int(rec['offset'] + rec['data_offset'])
+            order = '>' if rec['bigendian'] else '<'
+            if encoding in (STEIM1, STEIM2):
+                version = 1 if encoding == STEIM1 else 2
+                nframes = (int(rec['reclen']) - int(rec['data_offset'])) // 64
+                words = np.frombuffer(buf, '>u4', nframes * 16, start).reshape(nframes, 16)
+                if not rec['bigendian']:
+                    words = _steim_swap(words, version)
+                x0 = words[0, 1].astype(np.int64)
+                x0 -= (x0 & 0x80000000) << 1
+                diffs = _steim_diffs(words, version)
+                if n:
+                    out[pos] = x0
+                    out[pos + 1:pos + n] = x0 + np.cumsum(diffs[1:n])
+            else:
+                dtype = {INT16: 'i2', INT32: 'i4', FLOAT32: 'f4', FLOAT64: 'f8'}[encoding]
+                out[pos:pos + n] = np.frombuffer(buf, order + dtype, n, start)
+            pos += n
+    finally:
+        # Don't keep a view of 'buf' alive in a traceback, an mmap with
+        # exported buffers can't be closed
+        del words
+    return out[:npts]
+
+
+def _index_file(path, cache_dir):
+    """Return name of the cache file of the index of a file"""
+    name = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, name + '.npz')
+
+
+def load_index(path, cache_dir=INDEX_DIR):
+    """
+    Return the index of a file, from the cache in 'cache_dir' if it is
+    still current, building and saving it otherwise
+
+    Inputs
+    ------
+    path      : str of miniSEED file name
+    cache_dir : str of directory to keep indexes in (None -> no disk cache)
+
+    """
+    st = os.stat(path)
+    stamp = np.array([st.st_size, st.st_mtime])
+    if cache_dir is None:
+        return build_index(path)
+    cache_file = _index_file(path, cache_dir)
+    try:
+        with np.load(cache_file) as cached:
+            if np.array_equal(cached['stamp'], stamp):
+                return cached['index']
+    except (IOError, OSError, KeyError, ValueError):
+        pass
+    index = build_index(path)
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        fd, tmpname = tempfile.mkstemp(dir=cache_dir, suffix='.npz')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, index=index, stamp=stamp)
+        os.rename(tmpname, cache_file)
+    except (IOError, OSError):
+        pass  # Index still usable, just not cached
+    return index
+
+
+class MSEEDReader(object):
+    """
+    Read time windows from miniSEED files
+
+    Each file is opened and indexed once per reader, and the open file
+    is used for every read of that file (e.g. several channels of a
+    station day file). A reader can be shared by threads.
+
+    Attributes
+    ----------
+    cache_dir : str of directory of cached indexes (None -> don't cache)
+    mmap      : bool of whether to memory-map files and decode records
+                here (falls back to ObsPy for other encodings)
+
+    Methods
+    -------
+    read(path, starttime, endtime, foff=None, **codes) : Stream of window
+    close() : close all open files
+
+    """
+    def __init__(self, cache_dir=INDEX_DIR, mmap=False):
+        self.cache_dir = cache_dir
+        self.mmap = mmap
+        self._files = {}    # {path: open file}
+        self._maps = {}     # {path: mmap of file}
+        self._indexes = {}  # {path: index}
+        self._locks = {}    # {path: lock of opening and the file position}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, ex_type, ex_value, ex_tb):
+        self.close()
+
+    def close(self):
+        for mm in self._maps.values():
+            try:
+                mm.close()
+            except BufferError:
+                pass  # a decoded view is still alive, closed when collected
+        for fh in self._files.values():
+            fh.close()
+        self._maps.clear()
+        self._files.clear()
+        self._indexes.clear()
+        self._locks.clear()
+
+    def _open(self, path):
+        """
+        Return open file and index of a path
+
+        Only the lookup of the per-path lock is under the reader lock, so
+        different files are indexed and opened at the same time.
+        """
+        with self._lock:
+            try:
+                return self._files[path], self._indexes[path]
+            except KeyError:
+                lock = self._locks.setdefault(path, threading.Lock())
+        with lock:
+            try:
+                return self._files[path], self._indexes[path]
+            except KeyError:
+                pass
+            index = load_index(path, self.cache_dir)
+            fh = open(path, 'rb')
+            if self.mmap and index.size:
+                self._maps[path] = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            self._indexes[path] = index
+            self._files[path] = fh
+            return fh, index
+
+    @staticmethod
+    def select(index, starttime, endtime, foff=None, network=None,
+               station=None, location=None, channel=None):
+        """
+        Return index of the records of one channel covering a window
+
+        The channel is the one of the first record at or after byte 'foff'
+        (e.g. wfdisc.foff), and/or given by SEED codes.
+        """
+        # one sample of slack, times are only good to float precision
+        with np.errstate(divide='ignore'):
+            delta = np.where(index['sampling_rate'] > 0, 1. / index['sampling_rate'], 0.)
+        mask = ((index['endtime'] + delta >= starttime) &
+                (index['starttime'] - delta <= endtime))
+        if foff is not None:
+            first = np.searchsorted(index['offset'], foff)
+            if first >= len(index):
+                return index[:0]
+            for code in ('network', 'station', 'location', 'channel'):
+                mask &= index[code] == index[code][first]
+        codes = {'network': network, 'station': station, 'location': location,
+                 'channel': channel}
+        for code, value in codes.items():
+            if value is not None:
+                mask &= index[code] == value.encode('ascii')
+        return index[mask]
+
+    def read(self, path, starttime, endtime, foff=None, **codes):
+        """
+        Return obspy Stream of the data of a channel in a time window
+
+        Inputs
+        ------
+        path      : str of miniSEED file name
+        starttime : UTCDateTime or float of window start
+        endtime   : UTCDateTime or float of window end
+        foff      : int of byte offset of the channel in the file
+        **codes   : network, station, location, channel SEED codes
+
+        """
+        t0 = float(obspy.core.UTCDateTime(starttime).timestamp)
+        t1 = float(obspy.core.UTCDateTime(endtime).timestamp)
+        fh, index = self._open(path)
+        records = self.select(index, t0, t1, foff, **codes)
+        if not records.size:
+            return obspy.core.Stream()
+        if path in self._maps and set(records['encoding'].tolist()) <= set(DECODED_DTYPES):
+            st = self._decode(self._maps[path], records)
+        else:
+            with self._locks[path]:
+                st = self._read_obspy(fh, records)
+        st.trim(obspy.core.UTCDateTime(t0), obspy.core.UTCDateTime(t1))
+        if len(st) > 1:
+            st.merge()
+        return st
+
+    @staticmethod
+    def _decode(buf, records):
+        """
+        Return Stream of records decoded from a buffer, one Trace per run
+        of contiguous records with the same encoding and rate
+        """
+        records = np.sort(records, order='starttime')
+        rate = records['sampling_rate']
+        with np.errstate(divide='ignore'):
+            delta = np.where(rate > 0, 1. / rate, 0.)
+        # new trace where the record doesn't follow on from the last one
+        expected = records['endtime'][:-1] + delta[:-1]
+        breaks = ((np.abs(records['starttime'][1:] - expected) > 0.5 * delta[:-1]) |
+                  (rate[1:] != rate[:-1]) |
+                  (records['encoding'][1:] != records['encoding'][:-1]))
+        st = obspy.core.Stream()
+        for run in np.split(records, np.flatnonzero(breaks) + 1):
+            first = run[0]
+            header = {
+                'network': first['network'].decode('ascii'),
+                'station': first['station'].decode('ascii'),
+                'location': first['location'].decode('ascii'),
+                'channel': first['channel'].decode('ascii'),
+                'sampling_rate': float(first['sampling_rate']),
+                'starttime': obspy.core.UTCDateTime(float(first['starttime'])),
+                }
+            st.append(obspy.core.Trace(decode_records(buf, run), header=header))
+        return st
+
+    @staticmethod
+    def _read_obspy(fh, records):
+        """Return Stream of records read from a file and decoded by ObsPy"""
+        # Read runs of adjacent records in one go
+        buf = io.BytesIO()
+        end = None
+        for offset, reclen in zip(records['offset'], records['reclen']):
+            if offset != end:
+                fh.seek(offset)
+            buf.write(fh.read(reclen))
+            end = offset + reclen
+        buf.seek(0)
+        return obspy.core.read(buf, format='MSEED')
@@ -35,14 +35,21 @@ from obspy.core.util.xmlwrapper import XMLParser, tostring, etree
 from obspy.core.util import AttribDict
 import warnings
 
+import glob
 import inspect
 import io
 import os
+import threading
+from multiprocessing import Pool
 
 
 NSMAP_QUAKEML = {None: "http://quakeml.org/xmlns/bed/1.2",
                  'q': "http://quakeml.org/xmlns/quakeml/1.2"}
 
+# compiled RelaxNG schema, loaded once per process by _relaxng()
+_RELAXNG = None
+_RELAXNG_LOCK = threading.Lock()
+
 
 def isQuakeML(filename):
     """
@@ -71,12 +78,37 @@ def isQuakeML(filename):
     return True
 
 
+def _text2obj(text, convert_to=str):
+    """
+    Converts the text of an element into an object given by convert_to,
+    in the same way as XMLParser.xpath2obj.
+    """
+    # handle empty nodes
+    if text is None or text == '':
+        return None
+    # handle bool extra
+    if convert_to == bool:
+        if text.lower() in ["true", "1"]:
+            return True
+        elif text.lower() in ["false", "0"]:
+            return False
+        return None
+    try:
+        return convert_to(text)
+    except:
+        msg = "Could not convert %s to type %s. Returning None."
+        warnings.warn(msg % (text, convert_to))
+    return None
+
+
 class Unpickler(object):
     """
     De-serializes a QuakeML string into an ObsPy Catalog object.
     """
     def __init__(self, parser=None):
         self.parser = parser
+        # {element: {tag name: list of child elements}}
+        self._child_index = {}
 
     def load(self, file):
         """
@@ -102,11 +134,99 @@ class Unpickler(object):
         self.parser = XMLParser(io.BytesIO(string))
         return self._deserialize()
 
-    def _xpath2obj(self, *args, **kwargs):
-        return self.parser.xpath2obj(*args, **kwargs)
+    def iterload(self, file, skip=()):
+        """
+        Reads QuakeML file and yields one ObsPy Event at a time.
+
+        The file is parsed incrementally and each event element is
+        discarded once its Event is built, so memory use does not grow
+        with the size of the catalog.
+
+        :type file: str or file
+        :param file: File name or file-like object to read.
+        :type skip: sequence of str
+        :param skip: Names of sub-objects not to read, any of
+            ``'arrivals'``, ``'picks'``, ``'amplitudes'``,
+            ``'station_magnitudes'`` and ``'focal_mechanisms'``.
+        :rtype: generator of :class:`~obspy.core.event.Event`
+        """
+        root_el = None
+        catalog_el = None
+        event_tag = None
+        for action, el in etree.iterparse(file, events=('start', 'end')):
+            if action == 'start':
+                if root_el is None:
+                    root_el = el
+                elif catalog_el is None and el.getparent() is root_el and \
+                        el.tag.rsplit('}', 1)[-1] == 'eventParameters':
+                    # set default namespace for parser
+                    catalog_el = el
+                    namespace = None
+                    if el.tag.startswith('{'):
+                        namespace = el.tag[1:].split('}')[0]
+                    self.parser = XMLParser(root_el.getroottree())
+                    self.parser.namespace = namespace
+                    self._quakeml_namespaces = [
+                        ns for ns in root_el.nsmap.values()
+                        if ns.startswith(r"http://quakeml.org/xmlns/")]
+                    event_tag = '{%s}event' % namespace if namespace \
+                        else 'event'
+            elif el.tag == event_tag and el.getparent() is catalog_el:
+                event = self._event(el, skip=skip)
+                # free the parsed element before moving on
+                el.clear()
+                catalog_el.remove(el)
+                yield event
+        if catalog_el is None:
+            raise Exception("Not a QuakeML compatible file or string")
+
+    def _children(self, parent):
+        """
+        Returns dict of {tag name: list of child elements} of an element.
+
+        Only children in the parser namespace are indexed, the same ones a
+        namespaced XPath step would find. The index is built with a single
+        pass over the children and kept until the current event is done.
+        """
+        try:
+            return self._child_index[parent]
+        except KeyError:
+            pass
+        namespace = self.parser.namespace
+        prefix = '{%s}' % namespace if namespace else ''
+        index = {}
+        for child in parent:
+            tag = child.tag
+            # skip comments and processing instructions
+            if callable(tag):
+                continue
+            if prefix:
+                if not tag.startswith(prefix):
+                    continue
+                tag = tag[len(prefix):]
+            elif tag.startswith('{'):
+                continue
+            index.setdefault(tag, []).append(child)
+        self._child_index[parent] = index
+        return index
+
+    def _xpath2obj(self, xpath, xml_doc=None, convert_to=str,
+                   namespace=None):
+        # anything but a child lookup goes to the parser
+        if xml_doc is None or namespace is not None or '/' in xpath:
+            return self.parser.xpath2obj(xpath, xml_doc, convert_to,
+                                         namespace)
+        try:
+            text = self._children(xml_doc)[xpath][0].text
+        except KeyError:
+            return None
+        return _text2obj(text, convert_to)
 
-    def _xpath(self, *args, **kwargs):
-        return self.parser.xpath(*args, **kwargs)
+    def _xpath(self, xpath, xml_doc=None, namespace=None):
+        # anything but a child lookup goes to the parser
+        if xml_doc is None or namespace is not None or '/' in xpath:
+            return self.parser.xpath(xpath, xml_doc, namespace)
+        return self._children(xml_doc).get(xpath, [])
 
     def _comments(self, parent):
         obj = []
@@ -788,6 +908,84 @@ class Unpickler(object):
         self._extra(element, obj)
         return obj
 
+    def _event(self, event_el, skip=()):
+        """
+        Converts an etree.Element into an Event object.
+
+        :type event_el: etree.Element
+        :type skip: sequence of str
+        :param skip: Names of sub-objects not to read, any of
+            ``'arrivals'``, ``'picks'``, ``'amplitudes'``,
+            ``'station_magnitudes'`` and ``'focal_mechanisms'``.
+        :rtype: :class:`~obspy.core.event.Event`
+        """
+        # create new Event object
+        event = Event(force_resource_id=False)
+        # optional event attributes
+        event.preferred_origin_id = \
+            self._xpath2obj('preferredOriginID', event_el)
+        event.preferred_magnitude_id = \
+            self._xpath2obj('preferredMagnitudeID', event_el)
+        event.preferred_focal_mechanism_id = \
+            self._xpath2obj('preferredFocalMechanismID', event_el)
+        event_type = self._xpath2obj('type', event_el)
+        # Change for QuakeML 1.2RC4. 'null' is no longer acceptable as an
+        # event type. Will be replaced with 'not reported'.
+        if event_type == "null":
+            event_type = "not reported"
+        event.event_type = event_type
+        event.event_type_certainty = self._xpath2obj(
+            'typeCertainty', event_el)
+        event.creation_info = self._creation_info(event_el)
+        event.event_descriptions = self._event_description(event_el)
+        event.comments = self._comments(event_el)
+        # origins
+        event.origins = []
+        for origin_el in self._xpath('origin', event_el):
+            origin = self._origin(origin_el)
+            # arrivals
+            origin.arrivals = []
+            if 'arrivals' not in skip:
+                for arrival_el in self._xpath('arrival', origin_el):
+                    arrival = self._arrival(arrival_el)
+                    origin.arrivals.append(arrival)
+            # append origin with arrivals
+            event.origins.append(origin)
+        # magnitudes
+        event.magnitudes = []
+        for magnitude_el in self._xpath('magnitude', event_el):
+            magnitude = self._magnitude(magnitude_el)
+            event.magnitudes.append(magnitude)
+        # station magnitudes
+        event.station_magnitudes = []
+        if 'station_magnitudes' not in skip:
+            for magnitude_el in self._xpath('stationMagnitude', event_el):
+                magnitude = self._station_magnitude(magnitude_el)
+                event.station_magnitudes.append(magnitude)
+        # picks
+        event.picks = []
+        if 'picks' not in skip:
+            for pick_el in self._xpath('pick', event_el):
+                pick = self._pick(pick_el)
+                event.picks.append(pick)
+        # amplitudes
+        event.amplitudes = []
+        if 'amplitudes' not in skip:
+            for el in self._xpath('amplitude', event_el):
+                amp = self._amplitude(el)
+                event.amplitudes.append(amp)
+        # focal mechanisms
+        event.focal_mechanisms = []
+        if 'focal_mechanisms' not in skip:
+            for fm_el in self._xpath('focalMechanism', event_el):
+                fm = self._focal_mechanism(fm_el)
+                event.focal_mechanisms.append(fm)
+        event.resource_id = event_el.get('publicID')
+        self._extra(event_el, event)
+        # done with this event's elements
+        self._child_index.clear()
+        return event
+
     def _deserialize(self):
         # check node "quakeml/eventParameters" for global namespace
         try:
@@ -810,68 +1008,10 @@ class Unpickler(object):
         catalog.creation_info = self._creation_info(catalog_el)
         # loop over all events
         for event_el in self._xpath('event', catalog_el):
-            # create new Event object
-            event = Event(force_resource_id=False)
-            # optional event attributes
-            event.preferred_origin_id = \
-                self._xpath2obj('preferredOriginID', event_el)
-            event.preferred_magnitude_id = \
-                self._xpath2obj('preferredMagnitudeID', event_el)
-            event.preferred_focal_mechanism_id = \
-                self._xpath2obj('preferredFocalMechanismID', event_el)
-            event_type = self._xpath2obj('type', event_el)
-            # Change for QuakeML 1.2RC4. 'null' is no longer acceptable as an
-            # event type. Will be replaced with 'not reported'.
-            if event_type == "null":
-                event_type = "not reported"
-            event.event_type = event_type
-            event.event_type_certainty = self._xpath2obj(
-                'typeCertainty', event_el)
-            event.creation_info = self._creation_info(event_el)
-            event.event_descriptions = self._event_description(event_el)
-            event.comments = self._comments(event_el)
-            # origins
-            event.origins = []
-            for origin_el in self._xpath('origin', event_el):
-                origin = self._origin(origin_el)
-                # arrivals
-                origin.arrivals = []
-                for arrival_el in self._xpath('arrival', origin_el):
-                    arrival = self._arrival(arrival_el)
-                    origin.arrivals.append(arrival)
-                # append origin with arrivals
-                event.origins.append(origin)
-            # magnitudes
-            event.magnitudes = []
-            for magnitude_el in self._xpath('magnitude', event_el):
-                magnitude = self._magnitude(magnitude_el)
-                event.magnitudes.append(magnitude)
-            # station magnitudes
-            event.station_magnitudes = []
-            for magnitude_el in self._xpath('stationMagnitude', event_el):
-                magnitude = self._station_magnitude(magnitude_el)
-                event.station_magnitudes.append(magnitude)
-            # picks
-            event.picks = []
-            for pick_el in self._xpath('pick', event_el):
-                pick = self._pick(pick_el)
-                event.picks.append(pick)
-            # amplitudes
-            event.amplitudes = []
-            for el in self._xpath('amplitude', event_el):
-                amp = self._amplitude(el)
-                event.amplitudes.append(amp)
-            # focal mechanisms
-            event.focal_mechanisms = []
-            for fm_el in self._xpath('focalMechanism', event_el):
-                fm = self._focal_mechanism(fm_el)
-                event.focal_mechanisms.append(fm)
-            # finally append newly created event to catalog
-            event.resource_id = event_el.get('publicID')
-            self._extra(event_el, event)
-            catalog.append(event)
+            catalog.append(self._event(event_el))
         catalog.resource_id = catalog_el.get('publicID')
         self._extra(catalog_el, catalog)
+        self._child_index.clear()
         return catalog
 
     def _extra(self, element, obj):
@@ -931,7 +1071,11 @@ class Pickler(object):
     """
     Serializes an ObsPy Catalog object into QuakeML format.
     """
-    def __init__(self, nsmap=None):
+    def __init__(self, nsmap=None, stream=False, pretty_print=True):
+        # write events incrementally in 'dump'
+        self.stream = stream
+        # indent output, False for compact documents
+        self.pretty_print = pretty_print
         # set of namespace urls without given abbreviation
         self.ns_set = set()
         # dictionary of namespace/namespace urls
@@ -940,18 +1084,34 @@ class Pickler(object):
             self.ns_dict = {}
         self.ns_dict.update(NSMAP_QUAKEML.copy())
 
-    def dump(self, catalog, file):
+    def dump(self, catalog, file, events=None):
         """
         Writes ObsPy Catalog into given file.
 
         :type catalog: :class:`~obspy.core.event.Catalog`
         :param catalog: ObsPy Catalog object.
-        :type file: str
-        :param file: File name.
-        """
-        fh = open(file, 'wt')
-        fh.write(self._serialize(catalog))
-        fh.close()
+        :type file: str or file
+        :param file: File name or file-like object open for writing bytes.
+        :type events: iterable of :class:`~obspy.core.event.Event`, optional
+        :param events: Events to write instead of the events in catalog,
+            only used in stream mode (e.g. a generator of Events).
+        """
+        if not hasattr(file, "write"):
+            with open(file, 'wb') as fh:
+                return self.dump(catalog, fh, events=events)
+        if self.stream and hasattr(etree, "xmlfile"):
+            self._serialize_stream(catalog, file, events=events)
+        else:
+            if self.stream:
+                msg = "Incremental writing needs lxml >= 3.1, not streaming"
+                warnings.warn(msg, UserWarning)
+            if events is not None:
+                catalog = Catalog(events=list(events),
+                                  resource_id=catalog.resource_id,
+                                  description=catalog.description,
+                                  comments=catalog.comments,
+                                  creation_info=catalog.creation_info)
+            file.write(self._serialize(catalog))
 
     def dumps(self, catalog):
         """
@@ -1583,10 +1743,68 @@ class Pickler(object):
         self._extra(focal_mechanism, element)
         return element
 
-    def _serialize(self, catalog, pretty_print=True):
+    def _event(self, event):
+        """
+        Converts an Event into etree.Element object.
+
+        :type event: :class:`~obspy.core.event.Event`
+        :rtype: etree.Element
+        """
+        # create event node
+        event_el = etree.Element(
+            'event', attrib={'publicID': self._id(event.resource_id)})
+        # optional event attributes
+        if hasattr(event, "preferred_origin_id"):
+            self._str(event.preferred_origin_id, event_el,
+                      'preferredOriginID')
+        if hasattr(event, "preferred_magnitude_id"):
+            self._str(event.preferred_magnitude_id, event_el,
+                      'preferredMagnitudeID')
+        if hasattr(event, "preferred_focal_mechanism_id"):
+            self._str(event.preferred_focal_mechanism_id, event_el,
+                      'preferredFocalMechanismID')
+        # event type and event type certainty also are optional attributes.
+        if hasattr(event, "event_type"):
+            self._str(event.event_type, event_el, 'type')
+        if hasattr(event, "event_type_certainty"):
+            self._str(event.event_type_certainty, event_el,
+                      'typeCertainty')
+        # event descriptions
+        for description in event.event_descriptions:
+            el = etree.Element('description')
+            self._str(description.text, el, 'text', True)
+            self._str(description.type, el, 'type')
+            self._extra(description, el)
+            event_el.append(el)
+        self._comments(event.comments, event_el)
+        self._creation_info(event.creation_info, event_el)
+        # origins
+        for origin in event.origins:
+            event_el.append(self._origin(origin))
+        # magnitudes
+        for magnitude in event.magnitudes:
+            event_el.append(self._magnitude(magnitude))
+        # station magnitudes
+        for magnitude in event.station_magnitudes:
+            event_el.append(self._station_magnitude(magnitude))
+        # picks
+        for pick in event.picks:
+            event_el.append(self._pick(pick))
+        # amplitudes
+        for amp in event.amplitudes:
+            event_el.append(self._amplitude(amp))
+        # focal mechanisms
+        for focal_mechanism in event.focal_mechanisms:
+            event_el.append(self._focal_mechanism(focal_mechanism))
+        self._extra(event, event_el)
+        return event_el
+
+    def _serialize(self, catalog, pretty_print=None):
         """
         Converts a Catalog object into XML string.
         """
+        if pretty_print is None:
+            pretty_print = self.pretty_print
         catalog_el = etree.Element('eventParameters', attrib={'publicID':
                                    self._id(catalog.resource_id)})
         # optional catalog parameters
@@ -1595,55 +1813,8 @@ class Pickler(object):
         self._comments(catalog.comments, catalog_el)
         self._creation_info(catalog.creation_info, catalog_el)
         for event in catalog:
-            # create event node
-            event_el = etree.Element(
-                'event', attrib={'publicID': self._id(event.resource_id)})
-            # optional event attributes
-            if hasattr(event, "preferred_origin_id"):
-                self._str(event.preferred_origin_id, event_el,
-                          'preferredOriginID')
-            if hasattr(event, "preferred_magnitude_id"):
-                self._str(event.preferred_magnitude_id, event_el,
-                          'preferredMagnitudeID')
-            if hasattr(event, "preferred_focal_mechanism_id"):
-                self._str(event.preferred_focal_mechanism_id, event_el,
-                          'preferredFocalMechanismID')
-            # event type and event type certainty also are optional attributes.
-            if hasattr(event, "event_type"):
-                self._str(event.event_type, event_el, 'type')
-            if hasattr(event, "event_type_certainty"):
-                self._str(event.event_type_certainty, event_el,
-                          'typeCertainty')
-            # event descriptions
-            for description in event.event_descriptions:
-                el = etree.Element('description')
-                self._str(description.text, el, 'text', True)
-                self._str(description.type, el, 'type')
-                self._extra(description, el)
-                event_el.append(el)
-            self._comments(event.comments, event_el)
-            self._creation_info(event.creation_info, event_el)
-            # origins
-            for origin in event.origins:
-                event_el.append(self._origin(origin))
-            # magnitudes
-            for magnitude in event.magnitudes:
-                event_el.append(self._magnitude(magnitude))
-            # station magnitudes
-            for magnitude in event.station_magnitudes:
-                event_el.append(self._station_magnitude(magnitude))
-            # picks
-            for pick in event.picks:
-                event_el.append(self._pick(pick))
-            # amplitudes
-            for amp in event.amplitudes:
-                event_el.append(self._amplitude(amp))
-            # focal mechanisms
-            for focal_mechanism in event.focal_mechanisms:
-                event_el.append(self._focal_mechanism(focal_mechanism))
-            self._extra(event, event_el)
             # add event node to catalog
-            catalog_el.append(event_el)
+            catalog_el.append(self._event(event))
         self._extra(catalog, catalog_el)
         nsmap = self._get_namespace_map()
         root_el = etree.Element('{%s}quakeml' % NSMAP_QUAKEML['q'],
@@ -1651,6 +1822,61 @@ class Pickler(object):
         root_el.append(catalog_el)
         return tostring(root_el, pretty_print=pretty_print)
 
+    def _serialize_stream(self, catalog, fh, events=None, pretty_print=None):
+        """
+        Writes a Catalog object as XML to an open file, one event at a time.
+
+        Each event element is written as soon as it is serialized and then
+        dropped, so memory use does not grow with the number of events.
+
+        :type catalog: :class:`~obspy.core.event.Catalog`
+        :param catalog: Catalog with the eventParameters attributes.
+        :type fh: file
+        :param fh: File-like object open for writing bytes.
+        :type events: iterable of :class:`~obspy.core.event.Event`
+        :param events: Events to write, e.g. a generator, instead of the
+            events in the catalog.
+
+        .. note::
+            The document is equal to the one written by :meth:`_serialize`,
+            but namespaces are declared again on each event element, and
+            custom namespaces which are not in the nsmap and first used
+            inside an event get an automatic prefix there.
+        """
+        if events is None:
+            events = catalog
+        if pretty_print is None:
+            pretty_print = self.pretty_print
+        # everything in the opening tags (catalog attributes and namespaces)
+        # has to be known before the first byte is written
+        catalog_el = etree.Element('eventParameters', attrib={'publicID':
+                                   self._id(catalog.resource_id)})
+        if catalog.description:
+            self._str(catalog.description, catalog_el, 'description')
+        self._comments(catalog.comments, catalog_el)
+        self._creation_info(catalog.creation_info, catalog_el)
+        n_head = len(catalog_el)
+        self._extra(catalog, catalog_el)
+        nsmap = self._get_namespace_map()
+        root_el = etree.Element('{%s}quakeml' % NSMAP_QUAKEML['q'],
+                                nsmap=nsmap)
+        root_el.append(catalog_el)
+        with etree.xmlfile(fh, encoding='utf-8') as xf:
+            xf.write_declaration()
+            with xf.element(root_el.tag, nsmap=nsmap):
+                with xf.element(catalog_el.tag, attrib=dict(catalog_el.attrib)):
+                    for el in catalog_el[:n_head]:
+                        xf.write(el, pretty_print=pretty_print)
+                    for event in events:
+                        # attach to the tree so the root namespace prefixes
+                        # are used, then drop it once written
+                        event_el = self._event(event)
+                        catalog_el.append(event_el)
+                        xf.write(event_el, pretty_print=pretty_print)
+                        catalog_el.remove(event_el)
+                    for el in catalog_el[n_head:]:
+                        xf.write(el, pretty_print=pretty_print)
+
 
 def readQuakeML(filename):
     """
@@ -1677,7 +1903,135 @@ def readQuakeML(filename):
     return Unpickler().load(filename)
 
 
+def iterQuakeML(filename, skip=()):
+    """
+    Reads a QuakeML file and yields ObsPy Event objects one at a time.
+
+    Unlike :func:`readQuakeML`, the whole document is never held in memory,
+    so large catalogs can be read event by event.
+
+    :type filename: str or file
+    :param filename: QuakeML file to be read.
+    :type skip: sequence of str
+    :param skip: Names of sub-objects not to read, any of ``'arrivals'``,
+        ``'picks'``, ``'amplitudes'``, ``'station_magnitudes'`` and
+        ``'focal_mechanisms'``.
+    :rtype: generator of :class:`~obspy.core.event.Event`
+
+    .. rubric:: Example
+
+    >>> for event in iterQuakeML('/path/to/quakeml.xml',
+    ...                          skip=('picks', 'arrivals')):  # doctest: +SKIP
+    ...     print(event.preferred_origin_id)
+    """
+    return Unpickler().iterload(filename, skip=skip)
+
+
+def _archive_files(pathname):
+    """
+    Returns sorted list of QuakeML file names in a directory or matching a
+    glob pattern.
+    """
+    if os.path.isdir(pathname):
+        pathname = os.path.join(pathname, '*.xml')
+    return sorted(glob.glob(pathname))
+
+
+def _read_archive_file(args):
+    """
+    Pool worker, returns (filename, list of events, error message) of one
+    QuakeML file.
+    """
+    filename, skip = args
+    try:
+        events = list(Unpickler().iterload(filename, skip=skip))
+    except Exception as e:
+        return filename, [], "%s: %s" % (e.__class__.__name__, e)
+    return filename, events, None
+
+
+def _resolve_resource_ids(event):
+    """
+    Re-registers the objects of an Event with their ResourceIdentifiers.
+
+    Events passed back from another process lose the links between
+    resource ids and the objects they refer to, this restores them so
+    e.g. ``arrival.pick_id.getReferredObject()`` works on merged events.
+    """
+    objs = [event]
+    objs.extend(event.picks)
+    objs.extend(event.amplitudes)
+    objs.extend(event.station_magnitudes)
+    objs.extend(event.magnitudes)
+    objs.extend(event.focal_mechanisms)
+    for origin in event.origins:
+        objs.append(origin)
+        objs.extend(origin.arrivals)
+    for fm in event.focal_mechanisms:
+        if fm.moment_tensor is not None:
+            objs.append(fm.moment_tensor)
+    for obj in objs:
+        rid = getattr(obj, 'resource_id', None)
+        if rid is None:
+            continue
+        obj.resource_id = ResourceIdentifier(str(rid), referred_object=obj)
+
+
+def iterQuakeMLArchive(pathname, skip=(), nprocs=None, chunksize=16):
+    """
+    Reads many QuakeML files across a process pool and yields ObsPy Event
+    objects in file order.
+
+    Files which can not be read are skipped with a warning.
+
+    :type pathname: str
+    :param pathname: Directory of ``*.xml`` files or a glob pattern, e.g.
+        a directory of per-product files written by ``db2qml``.
+    :type skip: sequence of str
+    :param skip: Names of sub-objects not to read, see
+        :func:`iterQuakeML`.
+    :type nprocs: int, optional
+    :param nprocs: Number of worker processes (default number of CPUs).
+    :type chunksize: int, optional
+    :param chunksize: Number of files handed to a worker at a time.
+    :rtype: generator of :class:`~obspy.core.event.Event`
+    """
+    jobs = ((filename, tuple(skip)) for filename in _archive_files(pathname))
+    pool = Pool(nprocs)
+    try:
+        results = pool.imap(_read_archive_file, jobs, chunksize)
+        for filename, events, error in results:
+            if error is not None:
+                warnings.warn("Could not read %s: %s" % (filename, error))
+                continue
+            for event in events:
+                _resolve_resource_ids(event)
+                yield event
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def readQuakeMLArchive(pathname, skip=(), nprocs=None, chunksize=16):
+    """
+    Reads many QuakeML files across a process pool and returns one merged
+    ObsPy Catalog object.
+
+    See :func:`iterQuakeMLArchive` for the arguments.
+
+    :rtype: :class:`~obspy.core.event.Catalog`
+
+    .. rubric:: Example
+
+    >>> cat = readQuakeMLArchive('/path/to/qml/*.xml',
+    ...                          nprocs=8)  # doctest: +SKIP
+    """
+    return Catalog(events=list(iterQuakeMLArchive(
+        pathname, skip=skip, nprocs=nprocs, chunksize=chunksize)))
+
+
 def writeQuakeML(catalog, filename, validate=False, nsmap=None,
+                 stream=False, pretty_print=True, validate_async=False,
                  **kwargs):  # @UnusedVariable
     """
     Writes a QuakeML file.
@@ -1698,13 +2052,37 @@ def writeQuakeML(catalog, filename, validate=False, nsmap=None,
     :type nsmap: dict, optional
     :param nsmap: Additional custom namespace abbreviation mappings
         (e.g. `{"edb": "http://erdbeben-in-bayern.de/xmlns/0.1"}`).
+    :type stream: Boolean, optional
+    :param stream: If True, write each event as soon as it is serialized
+        instead of building the whole document in memory. Validation is
+        then done on the written file, which has to be given by name.
+    :type pretty_print: Boolean, optional
+    :param pretty_print: If False, write a compact document without
+        indentation, which is smaller and faster to write.
+    :type validate_async: Boolean, optional
+    :param validate_async: If True (and validate is True), write the file
+        right away and validate it in a background thread, which issues a
+        warning instead of raising if the validation fails. The thread is
+        returned so it can be joined.
     """
     nsmap_ = getattr(catalog, "nsmap", {})
     if nsmap:
         nsmap_.update(nsmap)
-    xml_doc = Pickler(nsmap=nsmap_).dumps(catalog)
+    if stream is True:
+        if validate is True and hasattr(filename, "write"):
+            raise ValueError("Can only validate a streamed file by name")
+        Pickler(nsmap=nsmap_, stream=True,
+                pretty_print=pretty_print).dump(catalog, filename)
+        if validate is True and validate_async is True:
+            return _validate_async(filename, filename)
+        if validate is True and not _validate(filename):
+            raise AssertionError(
+                "The final QuakeML file did not pass validation.")
+        return
+    xml_doc = Pickler(nsmap=nsmap_, pretty_print=pretty_print).dumps(catalog)
 
-    if validate is True and not _validate(io.BytesIO(xml_doc)):
+    if validate is True and validate_async is not True and \
+            not _validate(io.BytesIO(xml_doc)):
         raise AssertionError(
             "The final QuakeML file did not pass validation.")
 
@@ -1722,6 +2100,10 @@ def writeQuakeML(catalog, filename, validate=False, nsmap=None,
     if file_opened is True:
         fh.close()
 
+    if validate is True and validate_async is True:
+        return _validate_async(io.BytesIO(xml_doc),
+                               getattr(filename, "name", filename))
+
 
 def readSeisHubEventXML(filename):
     """
@@ -1738,39 +2120,86 @@ def readSeisHubEventXML(filename):
     return readQuakeML(temp)
 
 
+def _schema_location():
+    """
+    Returns the path of the QuakeML 1.2 RelaxNG schema, next to this module
+    or else the one shipped with ObsPy.
+    """
+    import obspy.core
+    name = os.path.join("docs", "QuakeML-1.2.rng")
+    here = os.path.dirname(inspect.getfile(inspect.currentframe()))
+    schema_location = os.path.join(here, name)
+    if not os.path.exists(schema_location):
+        schema_location = os.path.join(os.path.dirname(obspy.core.__file__),
+                                       name)
+    return schema_location
+
+
+def _relaxng():
+    """
+    Returns the compiled QuakeML RelaxNG schema, or None if this lxml can't
+    validate. The schema is only parsed and compiled once per process.
+    """
+    global _RELAXNG
+    with _RELAXNG_LOCK:
+        if _RELAXNG is None:
+            try:
+                from lxml.etree import RelaxNG
+                _RELAXNG = RelaxNG(etree.parse(_schema_location()))
+            except (ImportError, TypeError):
+                _RELAXNG = False
+    return _RELAXNG or None
+
+
 def _validate(xml_file, verbose=False):
     """
     Validates a QuakeML file against the QuakeML 1.2 RelaxNG Schema. Returns
     either True or False.
     """
-    try:
-        from lxml.etree import RelaxNG
-    except ImportError:
-        msg = "Could not validate QuakeML - try using a newer lxml version"
-        warnings.warn(msg, UserWarning)
-        return True
-    # Get the schema location.
-    schema_location = os.path.dirname(inspect.getfile(inspect.currentframe()))
-    schema_location = os.path.join(schema_location, "docs", "QuakeML-1.2.rng")
-
-    try:
-        relaxng = RelaxNG(etree.parse(schema_location))
-    except TypeError:
+    relaxng = _relaxng()
+    if relaxng is None:
         msg = "Could not validate QuakeML - try using a newer lxml version"
         warnings.warn(msg, UserWarning)
         return True
     xmldoc = etree.parse(xml_file)
 
-    valid = relaxng.validate(xmldoc)
+    # the compiled schema is shared, keep its error log to one thread
+    with _RELAXNG_LOCK:
+        valid = relaxng.validate(xmldoc)
+        errors = [str(entry) for entry in relaxng.error_log]
 
     # Pretty error printing if the validation fails.
     if verbose and valid is not True:
         print("Error validating QuakeML file:")
-        for entry in relaxng.error_log:
+        for entry in errors:
             print("\t%s" % entry)
     return valid
 
 
+def _validate_async(xml_file, name):
+    """
+    Validates a QuakeML file in a daemon thread and warns if the
+    validation fails. Returns the started thread.
+
+    :type name: str
+    :param name: Name of the file to report in the warning.
+    """
+    def run():
+        try:
+            valid = _validate(xml_file)
+        except Exception as e:
+            msg = "Could not validate QuakeML file %s: %s" % (name, e)
+            warnings.warn(msg, UserWarning)
+            return
+        if not valid:
+            msg = "QuakeML file %s did not pass validation." % name
+            warnings.warn(msg, UserWarning)
+    thread = threading.Thread(target=run, name="validate %s" % name)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod(exclude_empty=True)
@@ -18,24 +18,113 @@ def _timedef(comments):
             return c.text
 
 
-def add_quality_params_from_data(origin):
-    """Add OriginQuality data calculated from Origin Arrival info"""
-    azimuths =  {a.azimuth for a in origin.arrivals}
-    distances = {a.distance for a in origin.arrivals}
-    def_azis = {a.azimuth for a in origin.arrivals if rget(a.extra, 'timedef', 'value') == 'd'}
-    azi_a = np.array(list(azimuths))
-    dist_a = np.array(list(distances))
-    # Azimuthal gaps
-    azi_a.sort()
-    azi_a1 = np.roll(azi_a, -1)
-    azi_a1[-1] += 360
-    gaps = azi_a1 - azi_a
-    # Add to quality
-    if origin.quality:
-        origin.quality.associated_station_count = len(dist_a)
-        origin.quality.used_station_count = len(def_azis)
-        origin.quality.minimum_distance = dist_a.min()
-        origin.quality.maximum_distance = dist_a.max()
-        origin.quality.median_distance = np.median(dist_a)
-        origin.quality.azimuthal_gap = gaps.max()
+# GT5 criteria for local networks (Bondar et al., 2004), distances in degrees
+GT5_MIN_STATIONS = 10       # used stations within GT5_MAX_DISTANCE
+GT5_MAX_DISTANCE = 2.248    # 250 km
+GT5_MIN_DISTANCE = 0.270    # 30 km, at least one station this close
+GT5_MAX_GAP = 110.
+GT5_MAX_SECONDARY_GAP = 160.
+
+
+def azimuthal_gaps(azimuths):
+    """
+    Return primary and secondary azimuthal gaps of station azimuths
+
+    The secondary gap is the largest gap when any one station is removed,
+    i.e. the largest sum of two neighboring gaps.
+
+    Inputs
+    ------
+    azimuths : array of float of station azimuths in degrees (nan ignored)
+
+    Returns : float, float of gaps in degrees, or None, None for no stations
+
+    """
+    azimuths = np.asarray(azimuths, dtype=float)
+    azimuths = np.sort(azimuths[~np.isnan(azimuths)] % 360.)
+    if not azimuths.size:
+        return None, None
+    gaps = np.diff(np.append(azimuths, azimuths[0] + 360.))
+    secondary = min((gaps + np.roll(gaps, -1)).max(), 360.)
+    return float(gaps.max()), float(secondary)
 
+
+def _arrival_station(arrival, pick_stations):
+    """Return a str key for the station of an arrival"""
+    pick_id = str(arrival.pick_id)
+    if pick_id in pick_stations:
+        return pick_stations[pick_id]
+    try:
+        return arrival.pick_id.getReferredObject().waveform_id.station_code
+    except AttributeError:
+        # No pick to go by, same place is same station
+        return "{0}/{1}".format(arrival.azimuth, arrival.distance)
+
+
+def add_quality_params_from_data(origin, picks=None, ground_truth=False):
+    """
+    Add OriginQuality data calculated from Origin Arrival info
+
+    Inputs
+    ------
+    origin : obspy.core.event.Origin with arrivals
+    picks  : list of obspy.core.event.Pick of the arrivals, for the
+             station of each arrival (None -> use the arrival pick_id)
+    ground_truth : bool of whether to set a 'GT5' ground_truth_level
+             if the used stations meet the GT5 criteria (False)
+
+    Notes
+    -----
+    Stations with several phases are counted once. An arrival is used if
+    its CSS 'timedef' extra is 'd'. Gaps are from the used stations, or
+    all stations if none are used. Phase counts already set (e.g. from
+    nass/ndef) are kept.
+
+    """
+    arrivals = origin.arrivals
+    quality = origin.quality
+    if not arrivals or not quality:
+        return
+    pick_stations = {}
+    for p in picks or []:
+        if p.waveform_id is not None:
+            pick_stations[str(p.resource_id)] = p.waveform_id.station_code
+    # Pull arrival data into arrays once (None -> nan)
+    azi = np.array([a.azimuth for a in arrivals], dtype=float)
+    dist = np.array([a.distance for a in arrivals], dtype=float)
+    used = np.array([rget(getattr(a, 'extra', None), 'timedef', 'value') == 'd'
+                     for a in arrivals], dtype=bool)
+    keys = np.array([_arrival_station(a, pick_stations) for a in arrivals])
+    # Per station: first arrival, and whether any arrival is used
+    stations, first, inverse = np.unique(keys, return_index=True,
+                                         return_inverse=True)
+    sta_used = np.bincount(inverse, weights=used,
+                           minlength=len(stations)) > 0
+    sta_azi = azi[first]
+    sta_dist = dist[first]
+    # Counts
+    if quality.associated_phase_count is None:
+        quality.associated_phase_count = len(arrivals)
+    if quality.used_phase_count is None:
+        quality.used_phase_count = int(used.sum())
+    quality.associated_station_count = len(stations)
+    quality.used_station_count = int(sta_used.sum())
+    # Distances
+    dists = sta_dist[~np.isnan(sta_dist)]
+    if dists.size:
+        quality.minimum_distance = float(dists.min())
+        quality.maximum_distance = float(dists.max())
+        quality.median_distance = float(np.median(dists))
+    # Azimuthal gaps
+    gap_azi = sta_azi[sta_used] if sta_used.any() else sta_azi
+    gap, secondary_gap = azimuthal_gaps(gap_azi)
+    if gap is not None:
+        quality.azimuthal_gap = gap
+        quality.secondary_azimuthal_gap = secondary_gap
+    # Ground truth
+    if ground_truth and gap is not None:
+        used_dist = sta_dist[sta_used]
+        if (np.sum(used_dist <= GT5_MAX_DISTANCE) >= GT5_MIN_STATIONS and
+                np.any(used_dist <= GT5_MIN_DISTANCE) and
+                gap < GT5_MAX_GAP and secondary_gap < GT5_MAX_SECONDARY_GAP):
+            quality.ground_truth_level = 'GT5'
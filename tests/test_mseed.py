@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of nsl.obspy.mseed decoding against ObsPy
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import obspy
+
+from nsl.obspy.mseed import MSEEDReader
+
+
+class SteimByteOrderTestCase(unittest.TestCase):
+    """Steim records in either byte order decode to the ObsPy samples"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        rs = np.random.RandomState(0)
+        # mix of difference sizes, so every Steim word type is used
+        scales = rs.choice([3, 60, 400, 9000, 300000, 2 ** 26], 5000)
+        self.data = np.cumsum(rs.randint(-1, 2, 5000) * scales).astype(np.int32)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _check(self, encoding, byteorder):
+        tr = obspy.Trace(self.data, header={'network': 'NN', 'station': 'ABC',
+                                            'channel': 'HHZ', 'sampling_rate': 100.})
+        path = os.path.join(self.tmpdir, 'test.mseed')
+        tr.write(path, format='MSEED', encoding=encoding, byteorder=byteorder,
+                 reclen=512)
+        expected = obspy.read(path)[0].data
+        with MSEEDReader(cache_dir=None, mmap=True) as reader:
+            st = reader.read(path, tr.stats.starttime, tr.stats.endtime)
+        self.assertEqual(len(st), 1)
+        np.testing.assert_array_equal(st[0].data, expected)
+
+    def test_steim1_little_endian(self):
+        self._check('STEIM1', '<')
+
+    def test_steim2_little_endian(self):
+        self._check('STEIM2', '<')
+
+    def test_steim1_big_endian(self):
+        self._check('STEIM1', '>')
+
+    def test_steim2_big_endian(self):
+        self._check('STEIM2', '>')
+
+
+if __name__ == '__main__':
+    unittest.main()